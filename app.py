@@ -1,9 +1,12 @@
 import streamlit as st
-from recommender.graph_manager import recipe_recommender, graph_manager
+from app_state import metric_sinks, shared_graph_manager
+from recommender.instrumentation import metrics
 
 
 st.set_page_config(page_title="Recipe Recommender", layout="wide")
 
+metric_sinks()
+
 # --------- STYLE ----------
 st.markdown("""
 <style>
@@ -59,7 +62,10 @@ with col1:
         options=[
             "0 - Most Shared Ingredients",
             "1 - Highest Percentage of Shared Ingredients ",
-            "2 - Percentage of Shared Ingredients  + Recipe Rating"
+            "2 - Percentage of Shared Ingredients  + Recipe Rating",
+            "3 - Rare Shared Ingredients (IDF weighted)",
+            "4 - Jaccard Similarity",
+            "5 - Cosine Similarity"
         ],
         index=1
     )
@@ -69,7 +75,10 @@ with col1:
     explanation_map = {
         0: "👉 **Method 0**: The more ingredients two recipes share, the more similar they are considered.",
         1: "👉 **Method 1**: The number of shared ingredients is divided by the total number of ingredients in the compared recipe. This avoids favoring recipes just because they have many ingredients.",
-        2: "👉 **Method 2**: Like Method 1, but also incorporates the average recipe rating (weighted). Ideal for finding alternatives that are both similar **and** well-rated."
+        2: "👉 **Method 2**: Like Method 1, but also incorporates the average recipe rating (weighted). Ideal for finding alternatives that are both similar **and** well-rated.",
+        3: "👉 **Method 3**: Every shared ingredient is weighted by how rare it is across all recipes (IDF), so sharing saffron counts far more than sharing salt or butter.",
+        4: "👉 **Method 4**: Jaccard similarity: shared ingredients divided by all the distinct ingredients of both recipes.",
+        5: "👉 **Method 5**: Cosine similarity: shared ingredients divided by the geometric mean of both recipes' ingredient counts."
     }
     st.markdown(explanation_map[norm_type])
 
@@ -81,18 +90,63 @@ with col1:
 #with col2:
     #st.markdown("### Statistics")
 
+# --------- CONSTRAINTS ----------
+with st.sidebar:
+    st.markdown("### 🥕 Constraints")
+    include_text = st.text_input("Must include (comma separated)", value="")
+    exclude_text = st.text_input("Must exclude (comma separated)", value="", placeholder="e.g. peanuts, walnuts")
+    max_minutes = st.number_input("Max minutes (0 = any)", min_value=0, value=0, step=5)
+    min_rating = st.slider("Min average rating", min_value=0.0, max_value=5.0, value=0.0, step=0.5)
+    diverse = st.checkbox("Diverse results (one per recipe community)", value=False, help="Needs the graph analytics: python -m recommender.graph_analytics")
+
+constraints = {
+    "include_ingredients": [name.strip() for name in include_text.split(",") if name.strip()],
+    "exclude_ingredients": [name.strip() for name in exclude_text.split(",") if name.strip()],
+    "max_minutes": max_minutes or None,
+    "min_rating": min_rating or None
+}
+
+# --------- PROFILING ----------
+with st.sidebar:
+    st.markdown("### ⏱️ Performance")
+    show_latency = st.checkbox("Show latency breakdown", value=False)
+    profile_search = st.checkbox("Profile this search (cProfile + tracemalloc)", value=False)
+
 st.markdown("---")
 
+# --------- WARM-UP ----------
+graph_manager = shared_graph_manager()
+if diverse and graph_manager.analytics is not None:
+    constraints["max_per_community"] = 1
+
 # --------- RECOMMANDATIONS ----------
 if st.session_state["search_input"]:
     st.markdown("### 🔝 Top 10 Recommendations")
 
-    recipe_id, suggestions = graph_manager.find_recipe_by_name(st.session_state["search_input"])
-    if recipe_id is not None:
-        results = recipe_recommender.graph_manager.recommend_similar_recipes(recipe_id, top_k=10, normalization_type=norm_type)
-    else:
+    profile_paths = None
+    with metrics.trace() as trace:
+        if profile_search:
+            recipe_id, suggestions, results, profile_paths = graph_manager.profile_search(st.session_state["search_input"], top_k=10, normalization_type=norm_type, **constraints)
+        else:
+            recipe_id, suggestions = graph_manager.find_recipe_by_name(st.session_state["search_input"])
+            results = []
+            if recipe_id is not None:
+                results = graph_manager.recommend_similar_recipes(recipe_id, top_k=10, normalization_type=norm_type, **constraints)  # memoized across reruns
+
+    if recipe_id is None:
         st.warning(f"Recipe not found. Try : {', '.join(suggestions)}")
-        results = []
+
+    with st.sidebar:
+        if show_latency:
+            st.markdown(f"**Request: {trace.total * 1000:.1f} ms**")
+            for span in trace.breakdown():
+                st.text(f"{'  ' * span['depth']}{span['name']}: {span['ms']:.2f} ms")
+            for name, value in trace.counters.items():
+                st.text(f"{name}: {value}")
+        if profile_paths:
+            st.markdown("**Profile written to:**")
+            st.code(f"{profile_paths['cpu']}\n{profile_paths['memory']}")
+            st.caption(f"Peak traced memory: {profile_paths['peak_bytes'] / 1024:.0f} KiB. Open the .prof file with `python -m pstats` or snakeviz.")
     
     for r in results:
         with st.container():
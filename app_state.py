@@ -0,0 +1,35 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from recommender.graph_manager import build_app_graph_manager
+from recommender.instrumentation import configure
+
+
+@st.cache_resource
+def metric_sinks():
+    """Sinks from RECOMMENDER_METRICS (e.g. json,prometheus:9108), added once per process and not on every rerun"""
+    return configure()
+
+
+@st.cache_resource
+def warm_up():
+    """
+    One GraphManager per server process, shared by every session, rerun and page.
+    It is built on a background thread so the page renders (with a warming up status) while the graph loads.
+    """
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-up").submit(build_app_graph_manager), time.monotonic()
+
+
+def shared_graph_manager():
+    """The warm GraphManager, or a warming up status and a rerun while it is still loading"""
+    graph_manager_future, warm_up_started = warm_up()
+    if not graph_manager_future.done():
+        st.info(f"⏳ Warming up: loading the recipe graph ({time.monotonic() - warm_up_started:.0f}s)...")
+        time.sleep(1)
+        st.rerun()
+    if graph_manager_future.exception() is not None:
+        warm_up.clear()  # retry on the next rerun
+        st.error(f"Loading the recipe graph failed: {graph_manager_future.exception()}")
+        st.stop()
+    return graph_manager_future.result()
@@ -0,0 +1,94 @@
+"""
+Load test of the recommendation service (python -m recommender.service).
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8080 --concurrency 64 --requests 5000 --endpoint recommend
+
+Every one of --concurrency clients keeps one HTTP/1.1 connection open and sends its share of the requests one
+after the other. Recipe ids are drawn from the snapshot the service was started with. Reports the throughput and
+the p50 / p99 latency per endpoint.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+from recommender import snapshot
+
+
+def recipe_ids_and_names(snapshot_path):
+    meta = snapshot.read_meta(snapshot_path)
+    if meta is None:
+        raise SystemExit(f"No snapshot at {snapshot_path}, start the service once to write it")
+    arrays = snapshot.read_arrays(snapshot_path, meta)
+    return arrays['recipe_ids'].tolist(), snapshot.unpack_strings(arrays['name_offsets'], arrays['name_blob'])
+
+
+def make_request(endpoint, rng, recipe_ids, names, top_k, norms):
+    match endpoint:
+        case "recommend":
+            return "recommend", f"/recommend/{rng.choice(recipe_ids)}?k={top_k}&norm={rng.choice(norms)}"
+        case "recipe":
+            return "recipe", f"/recipe/{rng.choice(recipe_ids)}"
+        case "search":
+            name = rng.choice(names)
+            query = name[:-2] + "xq" if rng.random() < 0.5 and len(name) > 4 else name  # half of them need fuzzy matching
+            return "search", f"/search?q={quote(query)}"
+        case _:  # mix
+            return make_request(rng.choices(["recommend", "recipe", "search"], weights=[6, 3, 1])[0], rng, recipe_ids, names, top_k, norms)
+
+
+async def client(host, port, requests, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for endpoint, path in requests:
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+            await reader.readexactly(length)
+            latencies[endpoint].append(time.perf_counter() - start)
+            statuses[int(lines[0].split(" ")[1])] += 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    recipe_ids, names = recipe_ids_and_names(args.snapshot)
+    rng = random.Random(args.seed)
+    requests = [make_request(args.endpoint, rng, recipe_ids, names, args.top_k, args.norm) for _ in range(args.requests)]
+
+    latencies = defaultdict(list)
+    statuses = Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(client(url.hostname, url.port or 80, requests[i::args.concurrency], latencies, statuses) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} requests, {args.concurrency} connections, {elapsed:.2f}s: {args.requests / elapsed:,.0f} requests/s")
+    print(f"status codes: {dict(statuses)}")
+    for endpoint, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        print(f"  {endpoint:<10} n={len(values):<6} p50 {np.percentile(values, 50):7.2f} ms   p99 {np.percentile(values, 99):7.2f} ms   mean {values.mean():7.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of the recommendation service")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--snapshot", default="archive/snapshot", help="snapshot of the served graph, for the recipe ids and names")
+    parser.add_argument("--endpoint", choices=["recommend", "recipe", "search", "mix"], default="recommend")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--norm", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmarks of the GraphManager hot paths on synthetic datasets.
+
+    python -m benchmarks.run_benchmarks --sizes 5000 50000 230000
+    python -m benchmarks.run_benchmarks --sizes 5000 --save-baseline     # store the current numbers as the baseline
+
+Every size runs in its own process (so peak RSS is per size) and times loading, graph building, rating loading,
+exact and fuzzy name lookups and top-k recommendations for each normalization type.
+Results are written as JSON and compared against benchmarks/baseline.json; stages slower than the baseline by more
+than --tolerance are reported and make the command exit with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_dataset
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is in KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed(results, stage, func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    results[stage] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+    return value
+
+
+def latency_stats(func, inputs):
+    """Per-call latencies of func over inputs: p50 / p99 / mean in milliseconds"""
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+    return {'p50_ms': float(np.percentile(latencies, 50)), 'p99_ms': float(np.percentile(latencies, 99)),
+            'mean_ms': float(latencies.mean()), 'seconds': float(latencies.sum() / 1000), 'calls': len(latencies)}
+
+
+def run_size(data_path, n_recipes, n_queries, build_method, topk_depth):
+    """Benchmark one dataset size (runs inside a fresh process)"""
+    from recommender.graph_manager import GraphManager
+
+    # the dataset directory persists between runs: drop the cached rating / canonical tables so the CSVs are parsed
+    shutil.rmtree(os.path.join(data_path, "cache"), ignore_errors=True)
+
+    results = {}
+    gm = GraphManager(nrows=n_recipes, data_path=data_path, build=False)
+    df = timed(results, 'load_data', gm.load_data)
+    timed(results, 'build_graph', gm.build_graph, df, min_shared_ingredients=gm.min_shared_ingredients, method=build_method)
+    timed(results, 'load_ratings', gm.load_ratings)  # aggregates RAW_interactions.csv and writes the cache
+    timed(results, 'load_ratings_cached', gm.load_ratings)  # reads the cached table
+    if topk_depth:
+        timed(results, 'build_topk_index', gm.build_topk_index, depth=topk_depth)
+
+    rng = random.Random(0)
+    names = rng.sample(list(gm.name_to_id), min(n_queries, len(gm.name_to_id)))
+    typos = [name[:-2] + "xq" if len(name) > 4 else name + "xq" for name in names]
+    results['find_exact'] = latency_stats(gm.find_recipe_by_name, names)
+    results['find_fuzzy'] = latency_stats(gm.find_recipe_by_name, typos)
+
+    recipe_ids = rng.sample(gm.recipe_order.tolist(), min(n_queries, len(gm.recipe_order)))
+    for norm in GraphManager.NORMALIZATION_TYPES:  # every ranking, indexed or scored per query
+        results[f'recommend_norm{norm}'] = latency_stats(lambda rid: gm.recommend_similar_recipes(rid, 10, norm), recipe_ids)
+
+    results['graph'] = {
+        'recipes': gm.adjacency.number_of_nodes(),
+        'edges': gm.adjacency.number_of_edges(),
+        'ingredients': len(gm.ingredient_to_recipes),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds=0.01):
+    """
+    Stages slower than baseline * (1 + tolerance), as (size, stage, baseline seconds, seconds).
+    Stages taking less than min_seconds in total are too noisy to compare and are skipped.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, values in stages.items():
+            reference = baseline.get(size, {}).get(stage, {})
+            if 'seconds' not in values or 'seconds' not in reference or max(values['seconds'], reference['seconds']) < min_seconds:
+                continue
+            if values['seconds'] > reference['seconds'] * (1 + tolerance):
+                regressions.append((size, stage, reference['seconds'], values['seconds']))
+    return regressions
+
+
+def print_table(size, stages):
+    print(f"\n== {size} recipes ==")
+    for stage, values in stages.items():
+        if stage == 'graph':
+            print(f"  graph: {values['recipes']} recipes, {values['edges']} edges, {values['ingredients']} ingredients, "
+                  f"peak RSS {values['peak_rss_mb']:.0f} MB")
+        elif 'p50_ms' in values:
+            print(f"  {stage:<20} p50 {values['p50_ms']:8.2f} ms   p99 {values['p99_ms']:8.2f} ms")
+        else:
+            print(f"  {stage:<20} {values['seconds']:8.2f} s    peak RSS {values['peak_rss_mb']:.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GraphManager build, search and recommendation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000, 230000])
+    parser.add_argument("--data-dir", default=os.path.join(BENCH_DIR, "data"), help="where the synthetic datasets are cached")
+    parser.add_argument("--queries", type=int, default=200, help="name lookups / recommendations per stage")
+    parser.add_argument("--build-method", default="sparse")
+    parser.add_argument("--topk-depth", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results.json"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="skip stages faster than this in the comparison")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = []
+    for size in args.sizes:
+        data_path = os.path.join(args.data_dir, str(size))
+        if not os.path.exists(os.path.join(data_path, "RAW_interactions.csv")):
+            print(f"Generating {size} synthetic recipes in {data_path}...")
+            generate_dataset(data_path, size)
+        # fresh interpreter per size, so peak RSS is not shared; a worker killed (e.g. out of memory) raises BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results[str(size)] = pool.submit(run_size, data_path, size, args.queries, args.build_method, args.topk_depth).result()
+        except BrokenProcessPool:
+            print(f"\n== {size} recipes ==\n  the benchmark process died (out of memory?)")
+            failed.append(size)
+            continue
+        print_table(size, results[str(size)])
+
+    report = {'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+              'results': results, 'failed_sizes': failed}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    for size, stage, before, after in regressions:
+        print(f"REGRESSION {size} recipes / {stage}: {before:.3f}s -> {after:.3f}s ({after / before - 1:+.0%})")
+    if regressions or failed:
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
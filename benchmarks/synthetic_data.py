@@ -0,0 +1,91 @@
+"""
+Synthetic Food.com-shaped datasets for the benchmarks.
+
+Writes RAW_recipes.csv and RAW_interactions.csv with the columns of the Kaggle dataset.
+Ingredient frequencies follow a Zipf law (a few ingredients like salt or butter are in a large share of the recipes),
+and the list columns are Python list literals written by repr(), like in the real files.
+
+    python -m benchmarks.synthetic_data --recipes 50000 --output bench_data/50k
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+WORDS = ("chicken beef pork salmon tofu bean lentil rice pasta noodle potato tomato onion garlic lemon lime orange "
+         "apple banana berry chocolate vanilla cinnamon ginger curry chili spicy sweet sour easy quick best "
+         "grandma's mom's healthy low-fat creamy crispy grilled baked roasted fried slow-cooker soup salad stew "
+         "cake pie bread muffin cookie sauce dip casserole pizza taco burrito sandwich smoothie").split()
+STEP_VERBS = ["preheat oven to 350", "mix", "stir in", "add", "chop", "whisk", "bake for 30 minutes",
+              "simmer until tender", "season with salt and pepper", "serve warm", "let cool", "fold in"]
+
+
+def generate_dataset(path, n_recipes, n_ingredients=None, zipf_exponent=1.1, ratings_per_recipe=5, seed=0):
+    """Write a synthetic RAW_recipes.csv / RAW_interactions.csv pair of n_recipes recipes into path"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+    n_ingredients = n_ingredients or max(3000, n_recipes // 16)  # the Kaggle dump has ~15k distinct ingredients
+
+    # ingredient i is drawn with probability ~ 1 / (i + 1)^s
+    vocabulary = np.array([f"ingredient {i}" for i in range(n_ingredients)], dtype=object)
+    vocabulary[:8] = ["salt", "butter", "sugar", "eggs", "water", "flour", "mom's secret sauce", "onion"]
+    weights = 1.0 / np.arange(1, n_ingredients + 1) ** zipf_exponent
+    weights /= weights.sum()
+
+    sizes = np.clip(rng.poisson(9, n_recipes), 1, 40)
+    drawn = rng.choice(n_ingredients, size=int(sizes.sum()), p=weights)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    ingredients = [repr(list(dict.fromkeys(vocabulary[drawn[offsets[i]:offsets[i + 1]]].tolist()))) for i in range(n_recipes)]
+
+    n_steps = np.clip(rng.poisson(8, n_recipes), 1, 30)
+    step_choices = rng.integers(0, len(STEP_VERBS), int(n_steps.sum()))
+    step_offsets = np.concatenate([[0], np.cumsum(n_steps)])
+    steps = [repr([STEP_VERBS[j] for j in step_choices[step_offsets[i]:step_offsets[i + 1]]]) for i in range(n_recipes)]
+
+    name_words = rng.integers(0, len(WORDS), (n_recipes, 4))
+    name_lengths = rng.integers(1, 5, n_recipes)
+    names = [" ".join(WORDS[w] for w in name_words[i, :name_lengths[i]]) for i in range(n_recipes)]
+
+    recipe_ids = np.sort(rng.choice(n_recipes * 3, size=n_recipes, replace=False))
+    recipes = pd.DataFrame({
+        'name': names,
+        'id': recipe_ids,
+        'minutes': rng.integers(1, 240, n_recipes),
+        'contributor_id': rng.integers(1, 50_000, n_recipes),
+        'submitted': "2008-05-01",
+        'tags': "['easy', 'dinner']",
+        'nutrition': "[100.0, 5.0, 10.0, 2.0, 8.0, 3.0, 4.0]",
+        'n_steps': n_steps,
+        'steps': steps,
+        'description': np.where(rng.random(n_recipes) < 0.9, "a family favourite, quick and easy", None),
+        'ingredients': ingredients,
+        'n_ingredients': sizes
+    })
+    recipes.sort_values('name').to_csv(os.path.join(path, "RAW_recipes.csv"), index=False)
+
+    # every recipe has at least one rating, popular recipes get many more
+    n_extra = n_recipes * (ratings_per_recipe - 1)
+    rated = np.concatenate([recipe_ids, recipe_ids[rng.zipf(1.5, n_extra) % n_recipes]])
+    interactions = pd.DataFrame({
+        'user_id': rng.integers(1, 200_000, len(rated)),
+        'recipe_id': rated,
+        'date': "2010-01-01",
+        'rating': rng.choice(6, size=len(rated), p=[0.05, 0.02, 0.03, 0.1, 0.2, 0.6]),
+        'review': "great recipe"
+    })
+    interactions.to_csv(os.path.join(path, "RAW_interactions.csv"), index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Food.com-shaped dataset")
+    parser.add_argument("--recipes", type=int, default=5000)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate_dataset(args.output, args.recipes, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import streamlit as st
+from app_state import metric_sinks, shared_graph_manager
+
+st.set_page_config(page_title="What can I cook?", layout="wide")
+
+metric_sinks()
+
+st.markdown("## 🧺 What can I cook?")
+pantry_text = st.text_area("Ingredients you have (one per line or comma separated)", value="", placeholder="eggs\nbutter\nflour\nmilk")
+col1, col2 = st.columns(2)
+with col1:
+    max_missing = st.number_input("Max missing ingredients", min_value=0, value=2, step=1)
+with col2:
+    top_k = st.number_input("Number of recipes", min_value=1, max_value=100, value=10, step=5)
+
+pantry = [name.strip() for name in pantry_text.replace(",", "\n").splitlines() if name.strip()]
+
+st.markdown("---")
+
+graph_manager = shared_graph_manager()
+
+if pantry:
+    unknown = [name for name in pantry if graph_manager.canonical_ingredient(name) not in graph_manager.ingredient_index]
+    if unknown:
+        st.caption(f"Not found in any recipe: {', '.join(unknown)}")
+
+    results = graph_manager.recipes_from_pantry(pantry, max_missing=max_missing, top_k=top_k)
+    if not results:
+        st.warning("No recipe can be made with these ingredients. Try allowing more missing ingredients.")
+
+    for r in results:
+        with st.container():
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"**{r['name']}**")
+                if r['missing_ingredients']:
+                    st.markdown(f"{len(r['shared_ingredients'])} of {len(r['ingredients'])} ingredients, missing: {', '.join(r['missing_ingredients'])}")
+                else:
+                    st.markdown(f"✅ You have all {len(r['ingredients'])} ingredients")
+
+                if st.button("Details", key=f"btn_{r['id']}"):
+                    st.session_state["recipe_detail"] = r
+                    st.switch_page("pages/recipe.py")
+
+            with col2:
+                st.markdown(f"⭐ **{r['rating']:.1f}**" if r["rating"] else "⭐ **N/A**")
+            st.markdown("---")
+
+else:
+    st.info("List the ingredients in your pantry to find recipes you can cook.")
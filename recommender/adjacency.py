@@ -0,0 +1,394 @@
+"""
+Storage of the recipe similarity graph behind one adjacency interface, so GraphManager's queries never touch NetworkX.
+
+Nodes are addressed by recipe row (the row order of the recipe store): add_nodes appends rows, remove_node(row)
+moves the later rows up by one, exactly like RecipeStore.append / select. Every backend offers
+    add_nodes(recipe_ids), add_edges(rows, cols, weights), remove_node(row)
+    neighbors(row) -> (neighbor rows, weights), degree(row), weight(row, other)
+    number_of_nodes(), number_of_edges(), edges(), to_csr(), to_arrays(), to_networkx(), nbytes()
+
+- NetworkXAdjacency: a networkx.Graph keyed by recipe id (dicts of dicts, hundreds of bytes per edge)
+- CSRAdjacency: int64 indptr, int32 neighbor rows and uint8 weights (float32 if the weights are not small integers),
+  every row sorted by decreasing weight, so the heaviest neighbors are a prefix of the row
+
+Compare their memory and neighbor iteration speed on a snapshot:
+
+    python -m recommender.adjacency archive/snapshot
+"""
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    from recommender import snapshot
+    from recommender.recipe_store import deep_sizeof
+    from recommender.result_cache import LRUCache
+except ImportError:  # imported from inside recommender/
+    import snapshot
+    from recipe_store import deep_sizeof
+    from result_cache import LRUCache
+
+
+WEIGHT_DTYPES = (np.uint8, np.uint16, np.float32)
+
+
+def compact_weights(weights):
+    """uint8 (or uint16) for shared ingredient counts (small non-negative integers), float32 otherwise"""
+    weights = np.asarray(weights)
+    if len(weights) == 0:
+        return weights.astype(np.uint8)
+    if weights.dtype.kind in 'ui' or np.all(weights == np.round(weights)):
+        if weights.min() >= 0 and weights.max() <= np.iinfo(np.uint8).max:
+            return weights.astype(np.uint8)
+        if weights.min() >= 0 and weights.max() <= np.iinfo(np.uint16).max:
+            return weights.astype(np.uint16)
+    return weights.astype(np.float32)
+
+
+def ragged_positions(starts, lengths):
+    """Positions starts[i] .. starts[i] + lengths[i] - 1 of every i, concatenated"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(np.asarray(starts, dtype=np.int64) - offsets, lengths) + np.arange(lengths.sum())
+
+
+class NetworkXAdjacency():
+    """Adjacency kept in a networkx.Graph with recipe ids as nodes and the shared ingredient count as 'weight'"""
+    sorted_by_weight = False
+
+    def __init__(self, recipe_ids=()):
+        import networkx as nx  # only needed by this backend
+
+        self.graph = nx.Graph()
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.row_of: dict[int, int] = {rid: row for row, rid in enumerate(self.recipe_ids.tolist())}
+        self.graph.add_nodes_from(self.recipe_ids.tolist())
+        self._matrix = None  # cached to_csr()
+
+    @classmethod
+    def from_csr(cls, recipe_ids, indptr, indices, weights, sorted_by_weight=False):
+        self = cls(recipe_ids)
+        upper = sp.triu(sp.csr_array((weights, indices, indptr), shape=(len(self.recipe_ids), len(self.recipe_ids))), k=1).tocoo()
+        self.add_edges(upper.row, upper.col, upper.data)
+        return self
+
+    def add_nodes(self, recipe_ids):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.row_of.update({rid: row for row, rid in enumerate(recipe_ids.tolist(), start=len(self.recipe_ids))})
+        self.recipe_ids = np.concatenate([self.recipe_ids, recipe_ids])
+        self.graph.add_nodes_from(recipe_ids.tolist())
+        self._matrix = None
+
+    def add_edges(self, rows, cols, weights):
+        """Add undirected edges between recipe rows, every pair once"""
+        self.graph.add_weighted_edges_from(zip(self.recipe_ids[rows].tolist(), self.recipe_ids[cols].tolist(), np.asarray(weights).tolist()))
+        self._matrix = None
+
+    def remove_node(self, row: int):
+        self.graph.remove_node(int(self.recipe_ids[row]))
+        self.recipe_ids = np.delete(self.recipe_ids, row)
+        self.row_of = {rid: row for row, rid in enumerate(self.recipe_ids.tolist())}
+        self._matrix = None
+
+    def neighbors(self, row: int):
+        """(neighbor rows, weights) of a recipe row, in insertion order"""
+        edges = self.graph[int(self.recipe_ids[row])]
+        rows = np.fromiter((self.row_of[n] for n in edges), dtype=np.int64, count=len(edges))
+        weights = np.fromiter((d['weight'] for d in edges.values()), dtype=np.float64, count=len(edges))
+        return rows, weights
+
+    def degree(self, row: int):
+        return self.graph.degree(int(self.recipe_ids[row]))
+
+    def weight(self, row: int, other: int):
+        return self.graph[int(self.recipe_ids[row])][int(self.recipe_ids[other])]['weight']
+
+    def number_of_nodes(self):
+        return self.graph.number_of_nodes()
+
+    def number_of_edges(self):
+        return self.graph.number_of_edges()
+
+    def edges(self):
+        """(rows, cols, weights) of every edge once, rows < cols"""
+        upper = sp.triu(self.to_csr(), k=1).tocoo()
+        return upper.row, upper.col, upper.data
+
+    def to_csr(self):
+        """Symmetric CSR matrix of the weights, rows and columns follow the recipe rows"""
+        if self._matrix is None:
+            import networkx as nx
+            self._matrix = sp.csr_array(nx.to_scipy_sparse_array(self.graph, nodelist=self.recipe_ids.tolist(), weight='weight', dtype=np.int32))
+        return self._matrix
+
+    def to_arrays(self):
+        """(indptr, indices, weights) in the layout of CSRAdjacency, for snapshots"""
+        matrix = self.to_csr()
+        return CSRAdjacency.from_csr(self.recipe_ids, matrix.indptr, matrix.indices, matrix.data).to_arrays()
+
+    def to_networkx(self):
+        return self.graph
+
+    def nbytes(self):
+        return deep_sizeof(self.graph._adj) + deep_sizeof(self.graph._node) + deep_sizeof(self.row_of) + self.recipe_ids.nbytes
+
+
+class CSRAdjacency():
+    """
+    Adjacency as compressed sparse rows: the neighbors of row r are indices[indptr[r]:indptr[r + 1]] with their
+    weights, sorted by decreasing weight (ties by increasing row). Edges added with add_edges are buffered until the
+    adjacency is next read; then their positions are binary searched inside the rows they belong to and they are inserted
+    in one pass, so adding one recipe costs a copy of the arrays, not a sort of every edge.
+    """
+    sorted_by_weight = True
+
+    def __init__(self, recipe_ids=(), indptr=None, indices=None, weights=None):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.indptr = indptr if indptr is not None else np.zeros(len(self.recipe_ids) + 1, dtype=np.int64)
+        self.indices = indices if indices is not None else np.zeros(0, dtype=np.int32)
+        self.weights = weights if weights is not None else np.zeros(0, dtype=np.uint8)
+        self._pending = []  # (rows, cols, weights) added since the last merge
+        self._matrix = None  # cached to_csr()
+        self._networkx = None  # cached to_networkx()
+        self._by_column = LRUCache(1024, ttl=None)  # {row: (neighbor rows sorted, their weights)} for weight()
+
+    @classmethod
+    def from_csr(cls, recipe_ids, indptr, indices, weights, sorted_by_weight=False):
+        """
+        Wrap CSR arrays (e.g. memory-mapped from a snapshot). Arrays written by to_arrays() are used as they are when
+        sorted_by_weight is set; otherwise the rows are checked and only re-sorted if they are not in weight order yet.
+        Wider dtypes are narrowed without re-sorting.
+        """
+        if indices.dtype != np.int32:
+            indices = np.asarray(indices).astype(np.int32)
+        if weights.dtype not in WEIGHT_DTYPES:
+            weights = compact_weights(weights)
+        self = cls(recipe_ids, np.asarray(indptr, dtype=np.int64), indices, weights)
+        if not sorted_by_weight:
+            edge_rows = self._edge_rows()
+            values = np.asarray(weights, dtype=np.float64)
+            in_order = (values[1:] < values[:-1]) | ((values[1:] == values[:-1]) & (indices[1:] > indices[:-1]))
+            if not np.all(in_order | (edge_rows[1:] != edge_rows[:-1])):
+                self._set_edges(edge_rows, indices, weights)
+        return self
+
+    def _changed(self):
+        """Drop the views derived from the arrays"""
+        self._matrix = None
+        self._networkx = None
+        self._by_column.clear()
+
+    def _edge_rows(self):
+        return np.repeat(np.arange(len(self.recipe_ids), dtype=np.int64), np.diff(self.indptr))
+
+    def _set_edges(self, rows, cols, weights):
+        """Rebuild the arrays from directed (rows, cols, weights) entries"""
+        self._assemble([(np.asarray(rows), np.asarray(cols), compact_weights(weights))], symmetric=False)
+
+    def _assemble(self, blocks, symmetric, sort_entries=1 << 20):
+        """
+        Rebuild the arrays from a list of (rows, cols, weights) blocks, each entry also as (cols, rows) if symmetric.
+        Entries are counted per row, scattered block by block into the final arrays, and then every range of about
+        sort_entries entries is sorted by (row, -weight, col). Besides the final arrays (~10 bytes per edge) only
+        one block or row range is held in temporaries; the blocks list is emptied as it is consumed.
+        """
+        n = len(self.recipe_ids)
+        counts = np.zeros(n, dtype=np.int64)
+        for rows, cols, _ in blocks:
+            counts += np.bincount(rows, minlength=n)
+            if symmetric:
+                counts += np.bincount(cols, minlength=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        weight_dtype = np.result_type(*[weights.dtype for _, _, weights in blocks]) if blocks else np.uint8
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        weights = np.empty(indptr[-1], dtype=weight_dtype)
+
+        cursor = indptr[:-1].copy()  # next free slot of every row
+        while blocks:
+            rows, cols, block_weights = blocks.pop()
+            for source, target in ((rows, cols), (cols, rows)) if symmetric else ((rows, cols),):
+                order = np.argsort(source, kind='stable')
+                source = source[order]
+                rank = np.arange(len(source)) - np.searchsorted(source, source)  # position within the row's entries of this block
+                positions = cursor[source] + rank
+                indices[positions] = target[order]
+                weights[positions] = block_weights[order]
+                cursor += np.bincount(source, minlength=n)
+
+        start = 0
+        while start < n:
+            end = min(n, max(start + 1, np.searchsorted(indptr, indptr[start] + sort_entries, side='right') - 1))
+            lo, hi = indptr[start], indptr[end]
+            local_rows = np.repeat(np.arange(end - start), counts[start:end])
+            order = np.lexsort((indices[lo:hi], -weights[lo:hi].astype(np.float64), local_rows))
+            indices[lo:hi] = indices[lo:hi][order]
+            weights[lo:hi] = weights[lo:hi][order]
+            start = end
+
+        self.indptr, self.indices, self.weights = indptr, indices, weights
+        self._changed()
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        if len(self.indices) == 0:  # first build: assembled block by block
+            self._assemble(self._pending, symmetric=True)
+            self._pending = []
+            return
+        rows, cols, weights = (np.concatenate(parts) for parts in zip(*self._pending))
+        self._pending = []
+        rows, cols = rows.astype(np.int64), cols.astype(np.int64)
+        rows, cols, weights = np.concatenate([rows, cols]), np.concatenate([cols, rows]), np.concatenate([weights, weights])
+
+        order = np.lexsort((cols, -weights.astype(np.float64), rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+        # insertion point of every new entry: binary search on (-weight, col) inside its row, all entries at once
+        lo, hi = self.indptr[rows], self.indptr[rows + 1]
+        while np.any(lo < hi):
+            active = lo < hi
+            mid = np.minimum((lo + hi) // 2, len(self.indices) - 1)
+            mid_weights, mid_cols = self.weights[mid], self.indices[mid]
+            before = active & ((mid_weights > weights) | ((mid_weights == weights) & (mid_cols < cols)))
+            lo = np.where(before, mid + 1, lo)
+            hi = np.where(active & ~before, mid, hi)
+
+        weight_dtype = np.result_type(self.weights.dtype, compact_weights(weights).dtype)
+        self.indices = np.insert(np.asarray(self.indices), lo, cols.astype(np.int32))
+        self.weights = np.insert(np.asarray(self.weights, dtype=weight_dtype), lo, weights.astype(weight_dtype))
+        self.indptr = self.indptr + np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(self.recipe_ids)))])
+        self._changed()
+
+    def add_nodes(self, recipe_ids):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.recipe_ids = np.concatenate([self.recipe_ids, recipe_ids])
+        self.indptr = np.concatenate([self.indptr, np.full(len(recipe_ids), self.indptr[-1], dtype=np.int64)])
+        self._changed()
+
+    def add_edges(self, rows, cols, weights):
+        """Add undirected edges between recipe rows, every pair once; buffered as int32 rows and compact weights until merged"""
+        self._pending.append((np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32), compact_weights(weights)))
+        self._changed()
+
+    def remove_node(self, row: int):
+        self._merge_pending()
+        neighbors = np.asarray(self.indices[self.indptr[row]:self.indptr[row + 1]], dtype=np.int64)
+        counts = np.diff(self.indptr)
+        # the entries to drop: the row itself and the entry pointing back to it in every neighbor's row
+        keep = np.ones(len(self.indices), dtype=bool)
+        keep[self.indptr[row]:self.indptr[row + 1]] = False
+        positions = ragged_positions(self.indptr[neighbors], counts[neighbors])
+        keep[positions[self.indices[positions] == row]] = False
+        counts[neighbors] -= 1
+
+        self.recipe_ids = np.delete(self.recipe_ids, row)
+        self.indptr = np.zeros(len(self.recipe_ids) + 1, dtype=np.int64)
+        np.cumsum(np.delete(counts, row), out=self.indptr[1:])
+        self.indices = np.asarray(self.indices)[keep]  # rows keep their weight order
+        self.indices -= self.indices > row
+        self.weights = self.weights[keep]
+        self._changed()
+
+    def neighbors(self, row: int):
+        """(neighbor rows, weights) of a recipe row, heaviest first"""
+        self._merge_pending()
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.weights[start:end]
+
+    def degree(self, row: int):
+        self._merge_pending()
+        return int(self.indptr[row + 1] - self.indptr[row])
+
+    def weight(self, row: int, other: int):
+        """Weight of the edge between two rows (KeyError without edge), binary searched in the row sorted by neighbor"""
+        by_column = self._by_column.get(row)
+        if by_column is None:
+            rows, weights = self.neighbors(row)
+            order = np.argsort(rows)
+            by_column = (np.asarray(rows)[order], np.asarray(weights)[order])
+            self._by_column.put(row, by_column)
+        rows, weights = by_column
+        position = np.searchsorted(rows, other)
+        if position == len(rows) or rows[position] != other:
+            raise KeyError(other)
+        return weights[position].item()
+
+    def number_of_nodes(self):
+        return len(self.recipe_ids)
+
+    def number_of_edges(self):
+        self._merge_pending()
+        return len(self.indices) // 2
+
+    def edges(self):
+        """(rows, cols, weights) of every edge once, rows < cols"""
+        self._merge_pending()
+        edge_rows = self._edge_rows()
+        upper = edge_rows < self.indices
+        return edge_rows[upper], self.indices[upper].astype(np.int64), self.weights[upper]
+
+    def to_csr(self):
+        """The arrays as a scipy CSR matrix (no copy); column indices are in weight order, not sorted"""
+        self._merge_pending()
+        if self._matrix is None:
+            n = len(self.recipe_ids)
+            self._matrix = sp.csr_array((self.weights, self.indices, self.indptr), shape=(n, n))
+            self._matrix.has_sorted_indices = False
+        return self._matrix
+
+    def to_arrays(self):
+        """(indptr, indices, weights) as stored: int64, int32 and uint8 / float32, rows in weight order"""
+        self._merge_pending()
+        return self.indptr, self.indices, self.weights
+
+    def to_networkx(self):
+        """
+        The graph as a networkx.Graph (recipe ids as nodes), for analytics and export. It is built on the first call
+        and kept until the adjacency changes; treat it as read-only.
+        """
+        self._merge_pending()
+        if self._networkx is None:
+            graph = NetworkXAdjacency(self.recipe_ids)
+            graph.add_edges(*self.edges())
+            self._networkx = graph.graph
+        return self._networkx
+
+    def nbytes(self):
+        self._merge_pending()
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes + self.recipe_ids.nbytes
+
+
+BACKENDS = {'networkx': NetworkXAdjacency, 'csr': CSRAdjacency}
+
+
+def backend_class(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown graph backend: {name} (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[name]
+
+
+if __name__ == '__main__':
+    # python -m recommender.adjacency [snapshot directory]
+    path = sys.argv[1] if len(sys.argv) > 1 else "archive/snapshot"
+    meta = snapshot.read_meta(path)
+    if meta is None:
+        sys.exit(f"No snapshot found at {path}, start the app once to create it")
+    arrays = snapshot.read_arrays(path, meta, mmap=False)
+
+    print(f"{'backend':<10}{'load (s)':>10}{'MB':>10}{'bytes/edge':>12}{'all neighbors (s)':>19}")
+    for name, cls in BACKENDS.items():
+        start = time.perf_counter()
+        adjacency = cls.from_csr(arrays['recipe_ids'], arrays['adjacency_indptr'], arrays['adjacency_indices'], arrays['adjacency_weights'],
+                                 sorted_by_weight=meta.get('adjacency_order') == 'weight')
+        adjacency.number_of_edges()
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in range(adjacency.number_of_nodes()):
+            adjacency.neighbors(row)
+        scan_seconds = time.perf_counter() - start
+
+        nbytes = adjacency.nbytes()
+        print(f"{name:<10}{load_seconds:>10.2f}{nbytes / 1e6:>10.1f}{nbytes / max(adjacency.number_of_edges(), 1):>12.1f}{scan_seconds:>19.3f}")
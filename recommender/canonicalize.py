@@ -0,0 +1,238 @@
+"""
+Ingredient canonicalization and duplicate recipe collapsing, run between parsing and graph building.
+
+- ingredients: size / freshness descriptors are dropped, every word is folded to its singular form and a synonym map
+  is applied, so "large eggs", "eggs" and "egg" become one ingredient "egg"
+- recipes: recipes with the same normalized name and the same canonical ingredient set (exact duplicates, found by
+  hashing) or a Jaccard similarity of at least near_duplicate_threshold (near duplicates) are collapsed into the first one
+
+Collapsing copies removes their cliques of useless edges and shrinks the vocabulary; merged ingredient variants can also
+add the edges of recipes that really share an ingredient. Compare the edge counts with and without the stage:
+
+    python -m recommender.canonicalize --nrows 5000 --synonyms synonyms.json
+"""
+import argparse
+import json
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+try:
+    from recommender.sparse_similarity import build_incidence_matrix, shared_ingredient_edges
+except ImportError:  # imported from inside recommender/
+    from sparse_similarity import build_incidence_matrix, shared_ingredient_edges
+
+RULES_VERSION = 2  # bump when the folding rules or defaults change, so cached canonicalizations are redone
+
+DESCRIPTORS = frozenset({
+    'large', 'small', 'medium', 'extra-large', 'jumbo', 'fresh', 'freshly'
+})
+
+PLURAL_EXCEPTIONS = frozenset({
+    'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'brussels', 'citrus', 'lemongrass', 'watercress',
+    'grits', 'oats', 'bass', 'hibiscus', 'octopus', 'schnapps', 'mascarpone'
+})
+
+IRREGULAR_PLURALS = {
+    'leaves': 'leaf', 'halves': 'half', 'loaves': 'loaf', 'cookies': 'cookie', 'brownies': 'brownie',
+    'pies': 'pie', 'smoothies': 'smoothie', 'veggies': 'veggie', 'chilies': 'chili', 'chillies': 'chilli',
+    'hoagies': 'hoagie', 'cuties': 'cutie', 'calories': 'calorie', 'goodies': 'goodie', 'movies': 'movie'
+}  # the -ies words whose singular ends in -ie or -i, not -y
+
+DEFAULT_SYNONYMS = {
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'garbanzo bean': 'chickpea',
+    'cilantro leaf': 'cilantro',
+    'coriander leaf': 'cilantro',
+    'confectioner sugar': 'powdered sugar',
+    'icing sugar': 'powdered sugar',
+    'caster sugar': 'superfine sugar',
+    'courgette': 'zucchini',
+    'aubergine': 'eggplant',
+    'all-purpose flour': 'flour',
+    'plain flour': 'flour',
+    'chilli': 'chili'
+}
+
+_SPACES = re.compile(r"\s+")
+_NAME_NOISE = re.compile(r"[^a-z0-9 ]+")
+
+
+def singular(word: str):
+    """Rule based singular of an English word (berries -> berry, tomatoes -> tomato, peaches -> peach, eggs -> egg)"""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in PLURAL_EXCEPTIONS:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes') or word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def load_synonyms(path):
+    """Synonym map {variant: canonical name} from a JSON object, merged over DEFAULT_SYNONYMS; None gives the defaults"""
+    synonyms = dict(DEFAULT_SYNONYMS)
+    if path is not None:
+        with open(path, encoding="utf-8") as f:
+            synonyms.update({key.lower().strip(): value.lower().strip() for key, value in json.load(f).items()})
+    return synonyms
+
+
+class IngredientCanonicalizer():
+    """
+    Maps a cleaned ingredient name (lowercase, stripped) to its canonical name. Results are memoized per raw name:
+    the dataset has a few thousand distinct names for millions of ingredient entries.
+    """
+
+    def __init__(self, synonyms: dict[str, str]=None, descriptors=DESCRIPTORS):
+        self.synonyms = {self._fold(key, descriptors): value for key, value in (synonyms if synonyms is not None else DEFAULT_SYNONYMS).items()}
+        self.descriptors = descriptors
+        self.memo: dict[str, str] = {}
+
+    @staticmethod
+    def _fold(name, descriptors):
+        words = [singular(word) for word in _SPACES.split(name.lower().replace("'", "").strip()) if word and word not in descriptors]
+        return " ".join(words) if words else name.lower().strip()
+
+    def __call__(self, name: str):
+        canonical = self.memo.get(name)
+        if canonical is None:
+            folded = self._fold(name, self.descriptors)
+            canonical = self.synonyms.get(folded, folded)
+            self.memo[name] = canonical
+        return canonical
+
+    def canonical_list(self, ingredients):
+        """Canonical names of an ingredient list, first occurrence kept when several fold into one"""
+        return list(dict.fromkeys(self(ing) for ing in ingredients))
+
+
+def recipe_name_key(name: str):
+    """Name used to spot copies of a recipe: lowercase, punctuation removed, whitespace collapsed"""
+    return _SPACES.sub(" ", _NAME_NOISE.sub(" ", str(name).lower())).strip()
+
+
+def find_duplicates(names, ingredient_lists, near_duplicate_threshold: float=0.8):
+    """
+    Boolean mask of the recipes to keep, and the nr of exact and near duplicates dropped.
+    Exact duplicates share the hash of (name key, ingredient set); near duplicates have the same name key and a
+    Jaccard similarity of at least near_duplicate_threshold with a kept recipe of that name (None: exact only).
+    """
+    keep = np.ones(len(names), dtype=bool)
+    seen = set()  # (name key, ingredient set) of the kept recipes
+    kept_by_name = defaultdict(list)  # name key -> ingredient sets of the kept recipes
+    exact = near = 0
+    for i, (name, ingredients) in enumerate(zip(names, ingredient_lists)):
+        key = recipe_name_key(name)
+        ingredient_set = frozenset(ingredients)
+        if (key, ingredient_set) in seen:
+            keep[i] = False
+            exact += 1
+            continue
+        if near_duplicate_threshold is not None and any(
+                len(ingredient_set & other) >= near_duplicate_threshold * len(ingredient_set | other) for other in kept_by_name[key]):
+            keep[i] = False
+            near += 1
+            continue
+        seen.add((key, ingredient_set))
+        kept_by_name[key].append(ingredient_set)
+    return keep, exact, near
+
+
+def pair_work(ingredient_lists):
+    """Sum over the ingredients of C(recipes using it, 2): the recipe pairs the edge build has to count"""
+    document_frequency = defaultdict(int)
+    for ingredients in ingredient_lists:
+        for ing in set(ingredients):
+            document_frequency[ing] += 1
+    counts = np.fromiter(document_frequency.values(), dtype=np.int64, count=len(document_frequency))
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def count_edges(ingredient_lists, min_shared_ingredients=3):
+    """Number of recipe pairs sharing at least min_shared_ingredients, counted chunk by chunk like the sparse build"""
+    interned = {}
+    values = [interned.setdefault(ing, len(interned)) for ingredients in ingredient_lists for ing in ingredients]
+    offsets = np.zeros(len(ingredient_lists) + 1, dtype=np.int64)
+    np.cumsum([len(ingredients) for ingredients in ingredient_lists], out=offsets[1:])
+    incidence = build_incidence_matrix(offsets, values, len(interned))
+    return sum(len(rows) for rows, _, _ in shared_ingredient_edges(incidence, min_shared_ingredients))
+
+
+def canonicalize_recipes(names, ingredient_lists, canonicalizer: IngredientCanonicalizer, near_duplicate_threshold: float=0.8,
+                         min_shared_ingredients: int=None):
+    """
+    The whole stage: (keep mask, canonical ingredient lists of the kept recipes, report).
+    The report holds the recipe, vocabulary and pair work counts before and after, and with min_shared_ingredients the
+    exact edge count of the graph over the input recipes (edges_before); the caller adds edges_after from its graph.
+    """
+    canonical_lists = [canonicalizer.canonical_list(ingredients) for ingredients in ingredient_lists]
+    keep, exact, near = find_duplicates(names, canonical_lists, near_duplicate_threshold)
+    kept_lists = [ingredients for ingredients, ok in zip(canonical_lists, keep.tolist()) if ok]
+
+    report = {
+        'recipes_before': len(ingredient_lists),
+        'recipes_after': len(kept_lists),
+        'exact_duplicates': exact,
+        'near_duplicates': near,
+        'vocabulary_before': len({ing for ingredients in ingredient_lists for ing in ingredients}),
+        'vocabulary_after': len({ing for ingredients in kept_lists for ing in ingredients}),
+        'pair_work_before': pair_work(ingredient_lists),
+        'pair_work_after': pair_work(kept_lists)
+    }
+    if min_shared_ingredients is not None:
+        report['edges_before'] = count_edges(ingredient_lists, min_shared_ingredients)
+    return keep, kept_lists, report
+
+
+def format_report(report):
+    def change(before, after):
+        return f"{before:,} -> {after:,} ({after / max(before, 1) - 1:+.1%})"
+
+    lines = [
+        f"recipes:    {report['recipes_before']} -> {report['recipes_after']} "
+        f"({report['exact_duplicates']} exact and {report['near_duplicates']} near duplicates collapsed)",
+        f"vocabulary: {change(report['vocabulary_before'], report['vocabulary_after'])} ingredients",
+        f"pair work:  {change(report['pair_work_before'], report['pair_work_after'])} recipe pairs sharing an ingredient"
+    ]
+    if 'edges_before' in report:
+        lines.append(f"edges:      {change(report['edges_before'], report['edges_after'])}")
+    elif 'edges_after' in report:
+        lines.append(f"edges:      {report['edges_after']:,} after canonicalization (edges before: python -m recommender.canonicalize)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vocabulary and edge count with and without ingredient canonicalization")
+    parser.add_argument("--data-path", default="archive/")
+    parser.add_argument("--nrows", type=int, default=5000)
+    parser.add_argument("--min-shared", type=int, default=3)
+    parser.add_argument("--synonyms", default=None, help="JSON object {variant: canonical name}, merged over the defaults")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=0.8)
+    args = parser.parse_args(argv)
+
+    from recommender.graph_manager import GraphManager
+
+    graph_manager = GraphManager(nrows=args.nrows, data_path=args.data_path, build=False)
+    df = graph_manager.load_data()
+    names, ingredient_lists = df['name'].tolist(), df['ingredients_list'].tolist()
+
+    start = time.perf_counter()
+    keep, kept_lists, report = canonicalize_recipes(names, ingredient_lists, IngredientCanonicalizer(load_synonyms(args.synonyms)), args.near_duplicate_threshold)
+    seconds = time.perf_counter() - start
+    report['edges_before'] = count_edges(ingredient_lists, args.min_shared)
+    report['edges_after'] = count_edges(kept_lists, args.min_shared)
+
+    print(format_report(report))
+    print(f"canonicalization took {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""
+Offline structural analysis of the similarity graph, on its CSR adjacency instead of the NetworkX object.
+
+    python -m recommender.graph_analytics --snapshot archive/snapshot --samples 64
+
+Reads the adjacency straight from the snapshot (no NetworkX graph is built) and computes the degree distribution,
+connected components, label propagation communities, PageRank and sampled betweenness with sparse matrix products.
+The per-recipe results are written to <snapshot>/analytics, where GraphManager.load picks them up (e.g. for
+community-diverse recommendations). Rebuilding the snapshot removes them.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+try:
+    from recommender import snapshot
+except ImportError:  # imported from inside recommender/
+    import snapshot
+
+ANALYTICS_DIR = "analytics"
+
+
+def degree_histogram(degree):
+    """{'0': n, '1': n, '2-3': n, '4-7': n, ...}: nr of recipes per power of two bucket of the degree"""
+    buckets = np.where(degree > 0, np.floor(np.log2(np.maximum(degree, 1))).astype(np.int64) + 1, 0)
+    counts = np.bincount(buckets)
+    labels = ['0'] + [f"{1 << (b - 1)}" if b == 1 else f"{1 << (b - 1)}-{(1 << b) - 1}" for b in range(1, len(counts))]
+    return {label: int(count) for label, count in zip(labels, counts) if count}
+
+
+def label_propagation(adjacency, max_iter: int=30, update_share: float=0.5, seed: int=42):
+    """
+    Communities by weighted label propagation: every recipe takes the label with the largest edge weight among its
+    neighbors (keeping its own label on ties, other ties are broken at random). All votes of an iteration are one sort
+    of the (row, neighbor label) pairs; a random update_share of the recipes moves per iteration, which avoids the
+    oscillations of fully synchronous updates. Stops when every recipe holds one of its heaviest labels.
+    Returns community ids numbered by decreasing size, and the nr of iterations run.
+    """
+    n = adjacency.shape[0]
+    indices = np.asarray(adjacency.indices, dtype=np.int64)
+    weights = np.asarray(adjacency.data, dtype=np.float64)
+    edge_rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(adjacency.indptr))
+    labels = np.arange(n, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        keys, inverse = np.unique(edge_rows * n + labels[indices], return_inverse=True)
+        totals = np.bincount(inverse, weights=weights)
+        rows, candidates = keys // n, keys % n
+        is_own = candidates == labels[rows]
+        heaviest = np.zeros(n)
+        np.maximum.at(heaviest, rows, totals)
+        own_total = np.zeros(n)
+        own_total[rows[is_own]] = totals[is_own]
+        if np.all(own_total >= heaviest):
+            break
+        order = np.lexsort((rng.random(len(keys)), ~is_own, -totals, rows))
+        first = order[np.r_[True, rows[order][1:] != rows[order][:-1]]]
+        best = labels.copy()
+        best[rows[first]] = candidates[first]
+        labels = np.where(rng.random(n) < update_share, best, labels)
+
+    _, labels, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+    return rank[labels].astype(np.int32), iteration
+
+
+def modularity(adjacency, communities):
+    """Newman modularity of a partition of the weighted graph"""
+    weights = np.asarray(adjacency.data, dtype=np.float64)
+    total = weights.sum()
+    if total == 0:
+        return 0.0
+    edge_rows = np.repeat(np.arange(adjacency.shape[0]), np.diff(adjacency.indptr))
+    internal = weights[communities[edge_rows] == communities[adjacency.indices]].sum()
+    community_degree = np.bincount(communities, weights=np.asarray(adjacency.sum(axis=1)).ravel())
+    return float(internal / total - np.sum((community_degree / total) ** 2))
+
+
+def pagerank(adjacency, damping: float=0.85, tol: float=1e-8, max_iter: int=100):
+    """PageRank with edge weights by power iteration (one sparse matrix-vector product per step); dangling mass is spread evenly"""
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_weight = np.asarray(adjacency.sum(axis=1), dtype=np.float64).ravel()
+    inverse_out = np.divide(1.0, out_weight, out=np.zeros(n), where=out_weight > 0)
+    dangling = out_weight == 0
+    transposed = sp.csr_matrix(adjacency.T, dtype=np.float64)
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = damping * (transposed @ (rank * inverse_out) + rank[dangling].sum() / n) + (1 - damping) / n
+        converged = np.abs(updated - rank).sum() < tol
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+def approximate_betweenness(adjacency, samples: int=64, batch_size: int=32, seed: int=42):
+    """
+    Betweenness centrality (hop count shortest paths) estimated from Brandes' algorithm on `samples` random sources,
+    scaled to all n sources and normalized to [0, 1] like networkx.betweenness_centrality.
+    Breadth-first search and dependency accumulation run for batch_size sources at once: every level is one product
+    of the binary adjacency with an (n x batch_size) dense block.
+    """
+    n = adjacency.shape[0]
+    if n < 3:
+        return np.zeros(n)
+    binary = sp.csr_matrix((np.ones(len(adjacency.indices)), adjacency.indices, adjacency.indptr), shape=adjacency.shape)
+    sources = np.random.default_rng(seed).choice(n, size=min(samples, n), replace=False)
+
+    centrality = np.zeros(n)
+    for start in range(0, len(sources), batch_size):
+        batch = sources[start:start + batch_size]
+        columns = np.arange(len(batch))
+        paths = np.zeros((n, len(batch)))  # nr of shortest paths from the source
+        distance = np.full((n, len(batch)), -1, dtype=np.int32)
+        paths[batch, columns] = 1
+        distance[batch, columns] = 0
+
+        level = 0
+        while True:
+            reached = binary @ np.where(distance == level, paths, 0)
+            new = (distance < 0) & (reached > 0)
+            if not new.any():
+                break
+            level += 1
+            paths[new] = reached[new]
+            distance[new] = level
+
+        dependency = np.zeros((n, len(batch)))
+        for level in range(level, 0, -1):
+            share = np.where(distance == level, (1 + dependency) / np.where(paths > 0, paths, 1), 0)
+            dependency += np.where(distance == level - 1, paths * (binary @ share), 0)
+        dependency[batch, columns] = 0
+        centrality += dependency.sum(axis=1)
+
+    # each undirected path is counted from both ends; normalized by the (n - 1)(n - 2) / 2 pairs not involving the node
+    return centrality * (n / len(sources)) / 2 / ((n - 1) * (n - 2) / 2)
+
+
+class RecipeAnalytics():
+    """
+    Per-recipe graph attributes computed offline, addressed by recipe id:
+    degree, weighted_degree, component, community (0 = largest), pagerank and betweenness, plus a summary dict.
+    Recipes added after the analysis have no attributes (community -1).
+    """
+    ATTRIBUTES = ('degree', 'weighted_degree', 'component', 'community', 'pagerank', 'betweenness')
+
+    def __init__(self, recipe_ids, attributes: dict[str, np.ndarray], summary: dict):
+        self.recipe_ids = recipe_ids
+        self.row_of: dict[int, int] = {rid: row for row, rid in enumerate(recipe_ids.tolist())}
+        self.attributes = attributes
+        self.summary = summary
+
+    def get(self, name: str, recipe_ids, default=-1):
+        """Attribute values of the given recipes, default for the ones that were not analysed"""
+        rows = np.fromiter((self.row_of.get(rid, -1) for rid in recipe_ids), dtype=np.int64)
+        values = self.attributes[name]
+        return np.where(rows >= 0, values[np.maximum(rows, 0)], default) if len(values) else np.full(len(rows), default)
+
+    def save(self, path):
+        snapshot.write_snapshot(path, dict(self.attributes, recipe_ids=self.recipe_ids), {'summary': self.summary})
+
+    @classmethod
+    def load(cls, path):
+        """The analytics written to path, or None if there are none (of the current snapshot version)"""
+        meta = snapshot.read_meta(path)
+        if meta is None:
+            return None
+        arrays = snapshot.read_arrays(path, meta)
+        recipe_ids = arrays.pop('recipe_ids')
+        return cls(recipe_ids, arrays, meta['summary'])
+
+
+def compute_analytics(adjacency, recipe_ids, samples: int=64, seed: int=42):
+    """All analyses of a symmetric CSR adjacency whose rows follow recipe_ids, as RecipeAnalytics"""
+    adjacency = sp.csr_matrix(adjacency)
+    seconds = {}
+
+    start = time.perf_counter()
+    degree = np.diff(adjacency.indptr).astype(np.int32)
+    weighted_degree = np.asarray(adjacency.sum(axis=1)).ravel().astype(np.int64)
+    seconds['degrees'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    n_components, component = connected_components(adjacency, directed=False)
+    component_sizes = np.sort(np.bincount(component))[::-1]
+    seconds['components'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    community, iterations = label_propagation(adjacency, seed=seed)
+    community_sizes = np.bincount(community)
+    seconds['communities'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rank = pagerank(adjacency)
+    seconds['pagerank'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    betweenness = approximate_betweenness(adjacency, samples=samples, seed=seed)
+    seconds['betweenness'] = time.perf_counter() - start
+
+    summary = {
+        'recipes': int(adjacency.shape[0]),
+        'edges': int(adjacency.nnz // 2),
+        'degree': {'min': int(degree.min(initial=0)), 'median': float(np.median(degree)) if len(degree) else 0.0,
+                   'mean': float(degree.mean()) if len(degree) else 0.0, 'max': int(degree.max(initial=0)),
+                   'histogram': degree_histogram(degree)},
+        'components': {'count': int(n_components), 'largest': component_sizes[:5].tolist(),
+                       'isolated': int(np.count_nonzero(degree == 0))},
+        'communities': {'count': int(len(community_sizes)), 'largest': community_sizes[:5].tolist(),
+                        'modularity': modularity(adjacency, community), 'iterations': iterations},
+        'betweenness_samples': int(min(samples, adjacency.shape[0])),
+        'seconds': seconds
+    }
+    attributes = {
+        'degree': degree,
+        'weighted_degree': weighted_degree,
+        'component': component.astype(np.int32),
+        'community': community,
+        'pagerank': rank.astype(np.float32),
+        'betweenness': betweenness.astype(np.float32)
+    }
+    return RecipeAnalytics(np.asarray(recipe_ids), attributes, summary)
+
+
+def diversify(ranked, communities, top_k: int, max_per_community: int=1):
+    """
+    Greedy community-diverse cut of a best-first [(recipe_id, score), ...] list: at most max_per_community recipes
+    per community, the best skipped ones fill up the list if there are not top_k communities.
+    communities are aligned with ranked, -1 (not analysed) is never limited.
+    """
+    picked, skipped = [], []
+    per_community = {}
+    for item, community in zip(ranked, communities.tolist()):
+        if community >= 0 and per_community.get(community, 0) >= max_per_community:
+            skipped.append(item)
+            continue
+        per_community[community] = per_community.get(community, 0) + 1
+        picked.append(item)
+        if len(picked) == top_k:
+            return picked
+    return sorted(picked + skipped[:top_k - len(picked)], key=lambda item: -item[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline graph analytics on the CSR adjacency of a snapshot")
+    parser.add_argument("--snapshot", default="archive/snapshot", help="snapshot directory, see GraphManager.load_or_build")
+    parser.add_argument("--samples", type=int, default=64, help="betweenness sources")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    meta = snapshot.read_meta(args.snapshot)
+    if meta is None:
+        raise SystemExit(f"No snapshot at {args.snapshot}, build one with GraphManager.load_or_build")
+    arrays = snapshot.read_arrays(args.snapshot, meta)
+    n_recipes = len(arrays['recipe_ids'])
+    adjacency = sp.csr_matrix((arrays['adjacency_weights'], arrays['adjacency_indices'], arrays['adjacency_indptr']), shape=(n_recipes, n_recipes))
+
+    analytics = compute_analytics(adjacency, arrays['recipe_ids'], samples=args.samples, seed=args.seed)
+    analytics.save(os.path.join(args.snapshot, ANALYTICS_DIR))
+
+    summary = analytics.summary
+    print(f"{summary['recipes']} recipes, {summary['edges']} edges")
+    print(f"degree: min {summary['degree']['min']}, median {summary['degree']['median']:.0f}, mean {summary['degree']['mean']:.1f}, max {summary['degree']['max']}")
+    for bucket, count in summary['degree']['histogram'].items():
+        print(f"  {bucket:>11}: {count}")
+    print(f"components: {summary['components']['count']} (largest {summary['components']['largest']}, {summary['components']['isolated']} isolated recipes)")
+    print(f"communities: {summary['communities']['count']} (largest {summary['communities']['largest']}), "
+          f"modularity {summary['communities']['modularity']:.3f} after {summary['communities']['iterations']} iterations")
+    for name in ('pagerank', 'betweenness'):
+        top = np.argsort(-analytics.attributes[name])[:5]
+        print(f"top {name}: " + ", ".join(f"{snapshot.unpack_string(arrays['name_offsets'], arrays['name_blob'], row)} ({analytics.attributes[name][row]:.4f})" for row in top))
+    print("seconds: " + ", ".join(f"{stage} {value:.2f}" for stage, value in summary['seconds'].items()))
+    print(f"Per-recipe attributes written to {os.path.join(args.snapshot, ANALYTICS_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,100 @@
 import pandas as pd
-import ast
-import networkx as nx
+import numpy as np
+import scipy.sparse as sp
 import os
+import inspect
+import hashlib
+import json
 
 from collections import defaultdict, Counter
 from itertools import combinations
-from difflib import get_close_matches
 
-class GraphManager():
+try:
+    from recommender import snapshot
+    from recommender import ingredient_bitmaps
+    from recommender.adjacency import backend_class
+    from recommender.canonicalize import RULES_VERSION, IngredientCanonicalizer, canonicalize_recipes, format_report, load_synonyms
+    from recommender.graph_analytics import ANALYTICS_DIR, RecipeAnalytics, diversify
+    from recommender.ingest import parse_string_list, sample_csv, reservoir_sample_csv, aggregate_ratings
+    from recommender.instrumentation import metrics, profile_call
+    from recommender.minhash_lsh import lsh_edges
+    from recommender.name_index import NameIndex
+    from recommender.recipe_store import RecipeStore, memory_report, format_memory_report
+    from recommender.result_cache import LRUCache
+    from recommender.sparse_similarity import build_incidence_matrix, shared_ingredient_edges, ingredient_idf, weighted_overlap, append_rows, delete_row
+    from recommender.topk_index import TopKIndex, best_positions
+except ImportError:  # imported from inside recommender/ (e.g. statistics.ipynb)
+    import snapshot
+    import ingredient_bitmaps
+    from adjacency import backend_class
+    from canonicalize import RULES_VERSION, IngredientCanonicalizer, canonicalize_recipes, format_report, load_synonyms
+    from graph_analytics import ANALYTICS_DIR, RecipeAnalytics, diversify
+    from ingest import parse_string_list, sample_csv, reservoir_sample_csv, aggregate_ratings
+    from instrumentation import metrics, profile_call
+    from minhash_lsh import lsh_edges
+    from name_index import NameIndex
+    from recipe_store import RecipeStore, memory_report, format_memory_report
+    from result_cache import LRUCache
+    from sparse_similarity import build_incidence_matrix, shared_ingredient_edges, ingredient_idf, weighted_overlap, append_rows, delete_row
+    from topk_index import TopKIndex, best_positions
 
-    def __init__(self, nrows=200, data_path='archive/', debug=False, min_shared_ingredients=3, randomized_recipes=True):
+class GraphManager():
+    NORMALIZATION_TYPES = (0, 1, 2, 3, 4, 5)
+    RATING_NORMALIZATIONS = (2,)  # normalization types whose scores depend on the neighbor's rating
+    CORPUS_NORMALIZATIONS = (3,)  # normalization types whose scores depend on ingredient frequencies over all recipes
+    INDEXED_NORMALIZATIONS = (0, 1, 2, 4, 5)  # precomputed by build_topk_index; corpus scores change with every added or removed recipe
+
+    def __init__(self, nrows=200, data_path='archive/', debug=False, min_shared_ingredients=3, randomized_recipes=True,
+                 build_method='sparse', chunk_size=1024, topk_depth=None, sample_method='exact', random_state=42,
+                 rating_prior_weight=5.0, cache_size=1024, cache_ttl=600.0, lsh_bands=32, lsh_rows=2, canonicalize=False,
+                 synonyms_path=None, near_duplicate_threshold=0.8, graph_backend='csr', build=True):
         self.nrows: int = nrows  # nr of recipes used
         self.data_path: str = data_path
-        self.graph: nx.Graph = None
+        self.min_shared_ingredients: int = min_shared_ingredients
+        self.randomized_recipes: bool = randomized_recipes
+        self.sample_method: str = sample_method  # 'exact': same rows as DataFrame.sample, 'reservoir': single pass
+        self.random_state: int = random_state
+        self.rating_prior_weight: float = rating_prior_weight  # nr of "virtual" average ratings in the smoothed rating
+        self.build_method: str = build_method  # 'sparse' / 'combinations' (exact) or 'minhash' (approximate, see minhash_lsh)
+        self.lsh_bands: int = lsh_bands  # MinHash LSH parameters of the 'minhash' build method
+        self.lsh_rows: int = lsh_rows
+        self.canonicalize: bool = canonicalize  # canonical ingredient names and duplicate recipes collapsed, see canonicalize
+        self.synonyms_path: str = synonyms_path  # JSON synonym map merged over canonicalize.DEFAULT_SYNONYMS
+        self.near_duplicate_threshold: float = near_duplicate_threshold  # Jaccard similarity of same-name recipes collapsed as near duplicates
+        self.canonicalization_report: dict = None  # vocabulary, recipe and edge counts before / after canonicalization
+        self._canonicalizer: IngredientCanonicalizer = None
+        self.graph_backend: str = graph_backend  # storage of the similarity graph: 'csr' (compact) or 'networkx', see adjacency
+        self.adjacency = None  # the similarity graph over the recipe rows, every query goes through it
         self.id_to_name: dict[int, str] = {}
         self.name_to_id: dict[str, int] = {}
+        self.ids_by_name: dict[str, list[int]] = {}  # {lowercase name: ids of the recipes with that name, in row order}
+        self.name_index: NameIndex = None  # fuzzy and prefix search over the lowercase names
         self.ingredient_to_recipes: dict[str, set] = None  # {ingredient: {recipe_id1, recipe_id2, ...}}
-        self.recipe_ingredients: dict[int, list[str]] = {}
-        self.recipe_minutes: dict[int, int] = {}
-        self.recipe_instructions: dict[int, list[str]] = {}
-        self.recipe_descriptions: dict[int, str] = {}
-        self.id_to_rating: dict[int, float] = {}
-        self.id_to_rating_count: dict[int, int] = {}  # Not currently used but can be used in the future for a better weighting of ratings
+        self.store: RecipeStore = None  # ingredients, minutes, steps, descriptions and ratings by recipe row
+        self.incidence = None  # recipes x ingredients CSR matrix, rows follow recipe_order, columns the store vocabulary
+        self.topk_index: TopKIndex = None  # optional precomputed top-k neighbors, see build_topk_index
+        self.analytics: RecipeAnalytics = None  # optional offline graph analytics (communities, centrality), see graph_analytics
+        self._idf_incidence = None  # cached incidence with IDF weighted columns, reset when the incidence changes
+        self._ingredient_bitmaps = None  # per-ingredient bitsets for constrained queries, reset when the incidence changes
+        self.recommendation_cache = LRUCache(cache_size, cache_ttl)  # {(recipe_id, normalization_type, top_k): records}, cleared on updates
         self.recipe_ids_in_graph: set[int] = set()  # Track which recipes are actually in the graph
         self.debug: bool = debug
 
+        if not build:  # only configure, the caller runs load_data / build_graph / load_ratings (used by the benchmarks)
+            return
+
         df = self.load_data(randomized_recipes=randomized_recipes)
-        self.build_graph(df, min_shared_ingredients=min_shared_ingredients)
+        self.build_graph(df, min_shared_ingredients=min_shared_ingredients, method=build_method, chunk_size=chunk_size,
+                         lsh_bands=lsh_bands, lsh_rows=lsh_rows)
         self.load_ratings()  # Load ratings after graph is built
-
+        if self.canonicalization_report is not None:
+            self.canonicalization_report['edges_after'] = self.adjacency.number_of_edges()
+            if self.debug:
+                print(format_report(self.canonicalization_report))
+        if topk_depth:
+            self.build_topk_index(depth=topk_depth)  # needs both the graph and the ratings
+
+    @metrics.timed('load_data')
     def load_data(self, randomized_recipes=True):
         """Load and process recipe data using RAW_recipes.csv"""
         if self.debug:
@@ -45,21 +111,26 @@ class GraphManager():
             )
         else:        
             # a version with random columns, should be used in production to prevent wrong alphabetically balance while limiting the recipes
-            df = pd.read_csv(
-                os.path.join(self.data_path, "RAW_recipes.csv"), 
-                usecols=['id', 'name', 'ingredients', 'minutes', 'steps', 'description']
-            )  # read all not only nrows
-
-            df = df.sample(n=self.nrows, random_state=42)  # random state so it is shuffled but always the same way
+            # the file is streamed in chunks and only the sampled rows are kept, random state so it is shuffled but always the same way
+            sample = sample_csv if self.sample_method == 'exact' else reservoir_sample_csv
+            df = sample(
+                os.path.join(self.data_path, "RAW_recipes.csv"),
+                usecols=['id', 'name', 'ingredients', 'minutes', 'steps', 'description'],
+                n=self.nrows,
+                random_state=self.random_state
+            )
 
         # Remove entries without name
         df = df.dropna(subset=['name'])
 
         # Parse ingredients
-        df['ingredients_list'] = df['ingredients'].apply(self._parse_ingredients)
+        with metrics.span('parse_ingredients'):
+            df['ingredients_list'] = df['ingredients'].apply(self._parse_ingredients)
 
         # Remove recipes with no valid ingredients after parsing
         df = df[df['ingredients_list'].apply(len) > 0]
+        if self.canonicalize:
+            df = self._canonicalize_recipes(df)
         self.recipe_ids_in_graph = set(df['id'].tolist())
 
         # Deprecated: Filter out top 0.5% most common ingredients
@@ -67,18 +138,19 @@ class GraphManager():
 
         # Parse steps
         df['steps_list'] = df['steps'].apply(self._parse_steps)
-        self.recipe_instructions = dict(zip(df['id'], df['steps_list']))
 
-        # Store minutes
-        self.recipe_minutes = dict(zip(df['id'], df['minutes'].fillna(0).astype(int)))
-
-        # Store descriptions
+        # Store ingredients, steps, minutes and descriptions by recipe row
         df['description'] = df['description'].fillna("No description available.")
-        self.recipe_descriptions = dict(zip(df['id'], df['description']))
+        self.store = RecipeStore.from_lists(
+            df['id'].tolist(),
+            df['ingredients_list'].tolist(),
+            df['minutes'].fillna(0).astype(int).tolist(),
+            df['steps_list'].tolist(),
+            df['description'].tolist()
+        )
 
         # Create name dictionaries
-        self.id_to_name = dict(zip(df["id"], df["name"]))
-        self.name_to_id = {name.lower(): id for id, name in self.id_to_name.items()}
+        self._build_name_lookup(dict(zip(df["id"], df["name"])))
 
         if self.debug:
             print(f"Final recipes for graph: {len(df)}")
@@ -86,6 +158,15 @@ class GraphManager():
 
         return df
 
+    def _build_name_lookup(self, id_to_name):
+        """Name dictionaries from {recipe_id: name} in row order; a name shared by several recipes finds the last one"""
+        self.id_to_name = id_to_name
+        self.ids_by_name = defaultdict(list)
+        for recipe_id, name in id_to_name.items():
+            self.ids_by_name[name.lower()].append(recipe_id)
+        self.name_to_id = {name: ids[-1] for name, ids in self.ids_by_name.items()}
+        self.name_index = NameIndex(self.name_to_id)
+
     def _filter_top_ingredients(self, df):
         """Remove top 1% most common ingredients to reduce non meaningful neighbor connections """
         # Count ingredient frequencies
@@ -117,7 +198,7 @@ class GraphManager():
         ->  format like "['ingredient1', 'ingredient2']"
         """
 
-        ingredients_list = ast.literal_eval(ingredients_str)
+        ingredients_list = parse_string_list(ingredients_str)
 
         # Clean and normalize ingredients
         cleaned_ingredients = []
@@ -128,65 +209,204 @@ class GraphManager():
                 cleaned_ingredients.append(clean_ingredient)
         return cleaned_ingredients
     
+    @metrics.timed('canonicalize')
+    def _canonicalize_recipes(self, df):
+        """
+        Pipeline stage between parsing and graph building: canonical ingredient names and duplicate recipes collapsed
+        (see canonicalize). The kept recipes, their canonical ingredient lists and the report are cached in
+        <data_path>/cache/canonical/<key>, one entry per sample and parameters (the key hashes both), checked against
+        the hash of RAW_recipes.csv. The edge count before the stage is taken on a miss and cached with the report.
+        """
+        csv_path = os.path.join(self.data_path, "RAW_recipes.csv")
+        params = {'rules': RULES_VERSION, 'synonyms': self._synonyms_digest(), 'near_duplicate_threshold': self.near_duplicate_threshold,
+                  'min_shared_ingredients': self.min_shared_ingredients}  # edges_before of the report
+        input_ids = df['id'].to_numpy(dtype=np.int64)
+        key = hashlib.blake2b(json.dumps(params, sort_keys=True).encode("utf-8") + input_ids.tobytes(), digest_size=8).hexdigest()
+        cache_path = os.path.join(self.data_path, "cache", "canonical", key)
+
+        meta = snapshot.read_meta(cache_path)
+        arrays = snapshot.read_arrays(cache_path, meta, mmap=False) if meta is not None and meta['params'] == params and snapshot.snapshot_sources_match(cache_path, meta, [csv_path]) else None
+        if arrays is not None and np.array_equal(arrays['input_ids'], input_ids):
+            metrics.count('canonical_cache_hits')
+            keep = arrays['keep']
+            vocabulary = snapshot.unpack_strings(arrays['vocabulary_offsets'], arrays['vocabulary_blob'])
+            offsets, values = arrays['ingredient_offsets'], arrays['ingredient_values'].tolist()
+            ingredient_lists = [[vocabulary[i] for i in values[offsets[r]:offsets[r + 1]]] for r in range(len(offsets) - 1)]
+            report = meta['report']
+        else:
+            metrics.count('canonical_cache_misses')
+            keep, ingredient_lists, report = canonicalize_recipes(df['name'].tolist(), df['ingredients_list'].tolist(),
+                                                                  self.canonicalizer(), self.near_duplicate_threshold, self.min_shared_ingredients)
+            interned = {}
+            offsets, values = snapshot.pack_ragged([[interned.setdefault(ing, len(interned)) for ing in ingredients] for ingredients in ingredient_lists])
+            vocabulary_offsets, vocabulary_blob = snapshot.pack_strings(list(interned))
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            snapshot.write_snapshot(
+                cache_path,
+                {'input_ids': input_ids, 'keep': keep, 'ingredient_offsets': offsets, 'ingredient_values': values,
+                 'vocabulary_offsets': vocabulary_offsets, 'vocabulary_blob': vocabulary_blob},
+                {'sources': snapshot.describe_sources([csv_path]), 'params': params, 'report': report}
+            )
+
+        df = df[keep].copy()
+        df['ingredients_list'] = ingredient_lists
+        self.canonicalization_report = dict(report)
+        return df
+
+    def _synonyms_digest(self):
+        return snapshot.file_digest(self.synonyms_path) if self.synonyms_path else None
+
+    def canonicalizer(self):
+        """The IngredientCanonicalizer of this graph's synonym map, memoized"""
+        if self._canonicalizer is None:
+            self._canonicalizer = IngredientCanonicalizer(load_synonyms(self.synonyms_path))
+        return self._canonicalizer
+
+    def canonical_ingredient(self, name: str):
+        """Vocabulary name of a user given ingredient: lowercase and stripped, and canonical when the graph is built with canonicalize"""
+        name = name.lower().strip()
+        return self.canonicalizer()(name) if self.canonicalize else name
+
     def _parse_steps(self, steps_str):
         try:
-            steps = ast.literal_eval(steps_str)
+            steps = parse_string_list(steps_str)
             return [step.strip() for step in steps if isinstance(step, str)]
         except Exception:
             return []
 
+    @metrics.timed('load_ratings')
     def load_ratings(self):
         """Load and calculate average ratings for each recipe"""
         if self.debug:
             print("Loading rating data...")
 
-        # Load ratings data
-        ratings_df = pd.read_csv(os.path.join(self.data_path, "RAW_interactions.csv"), 
-                                usecols=["recipe_id", "rating"])
+        # Per-recipe sums and counts over all interactions (cached on disk, see _rating_table)
+        rated_ids, sums, counts = self._rating_table()
 
-        # Filter to only include ratings for recipes in our graph
-        ratings_df = ratings_df[ratings_df['recipe_id'].isin(self.recipe_ids_in_graph)]
+        # Align the ratings with the recipe rows of the store (0 ratings for recipes without interactions)
+        table = pd.DataFrame({'sum': sums, 'count': counts}, index=rated_ids).reindex(self.recipe_order, fill_value=0)
+        prior_mean = sums.sum() / counts.sum() if counts.sum() else 0.0  # average of all ratings in the dataset
+        self.store.set_ratings(table['sum'].to_numpy(), table['count'].to_numpy(), prior_mean=prior_mean, prior_weight=self.rating_prior_weight)
 
-        # Calculate average rating for each recipe
-        avg_ratings = ratings_df.groupby('recipe_id')['rating'].agg(['mean', 'count']).reset_index()
-        avg_ratings.columns = ['recipe_id', 'avg_rating', 'rating_count']
+        if self.debug:
+            print(f"Loaded ratings for {np.count_nonzero(self.store.rating_count)} recipes (out of {len(self.recipe_ids_in_graph)} in graph)")
+            if np.count_nonzero(self.store.rating_count) > 0:
+                print(f"Average rating across recipes in graph: {np.nanmean(self.store.rating):.2f}")
 
-        # Create id to rating dictionaries for fast lookup
-        self.id_to_rating = dict(zip(avg_ratings['recipe_id'], avg_ratings['avg_rating']))
-        self.id_to_rating_count = dict(zip(avg_ratings['recipe_id'], avg_ratings['rating_count']))
+    def _rating_table(self):
+        """
+        (recipe_ids, rating_sums, rating_counts) of every rated recipe in RAW_interactions.csv.
+        The table is cached as <data_path>/cache/ratings, keyed by the hash of the CSV, so the 1M+ interactions
+        are only aggregated again when the file changes.
+        """
+        csv_path = os.path.join(self.data_path, "RAW_interactions.csv")
+        cache_path = os.path.join(self.data_path, "cache", "ratings")
+
+        meta = snapshot.read_meta(cache_path)
+        if meta is not None and snapshot.snapshot_sources_match(cache_path, meta, [csv_path]):
+            metrics.count('ratings_cache_hits')
+            arrays = snapshot.read_arrays(cache_path, meta, mmap=False)
+            return arrays['recipe_ids'], arrays['rating_sums'], arrays['rating_counts']
+
+        metrics.count('ratings_cache_misses')
+        rated_ids, sums, counts = aggregate_ratings(csv_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        snapshot.write_snapshot(
+            cache_path,
+            {'recipe_ids': rated_ids, 'rating_sums': sums, 'rating_counts': counts},
+            {'sources': snapshot.describe_sources([csv_path])}
+        )
+        return rated_ids, sums, counts
 
+    @metrics.timed('build_graph')
+    def build_graph(self, df, min_shared_ingredients: int=3, method: str='sparse', chunk_size: int=1024, lsh_bands: int=32, lsh_rows: int=2):
+        """
+        Build the recipe similarity graph
+        method 'sparse': shared ingredient counts from blocked sparse products of the incidence matrix
+        method 'combinations': pairwise loop over the recipes of every ingredient (slow, O(n²) for common ingredients)
+        Both produce the same edges and weights.
+        method 'minhash': approximate, only the candidate pairs of a MinHash LSH index (lsh_bands x lsh_rows) are
+        verified, so some edges are missed (see minhash_lsh for the recall report); weights are exact.
+        """
         if self.debug:
-            print(f"Loaded ratings for {len(self.id_to_rating)} recipes (out of {len(self.recipe_ids_in_graph)} in graph)")
-            if len(self.id_to_rating) > 0:
-                print(f"Average rating across recipes in graph: {avg_ratings['avg_rating'].mean():.2f}")
+            print("Building ingredient-to-recipes mapping...")
+
+        # Build ingredient-to-recipes mapping from the incidence matrix of the store's ingredient lists
+        self.incidence = build_incidence_matrix(self.store.ingredient_offsets, self.store.ingredient_values, len(self.store.vocabulary))
+        self._build_ingredient_to_recipes()
 
-    def build_graph(self, df, min_shared_ingredients: int=3):
-        """Build the recipe similarity graph"""
         if self.debug:
-            print("Building ingredient-to-recipes mapping...")
+            print("Building similarity graph...")
+            print(f"Total unique ingredients: {len(self.ingredient_to_recipes)}")
+
+        # Create the graph over the recipe rows
+        self.adjacency = backend_class(self.graph_backend)(self.recipe_order)
+
+        match method:
+            case 'sparse':
+                self._add_edges_sparse(min_shared_ingredients, chunk_size)
+            case 'combinations':
+                self._add_edges_combinations(min_shared_ingredients)
+            case 'minhash':
+                self._add_edges_minhash(min_shared_ingredients, lsh_bands, lsh_rows)
+            case _:
+                raise ValueError(f"Unknown graph build method: {method}")
 
-        # Build ingredient-to-recipes mapping
+        if self.debug:
+            print(f"Graph built: {self.adjacency.number_of_nodes()} nodes, {self.adjacency.number_of_edges()} edges")
+            print(f"Minimum shared ingredients threshold: {min_shared_ingredients}")
+
+    def _build_ingredient_to_recipes(self):
+        """{ingredient: {recipe_id, ...}} from the columns of the incidence matrix"""
+        by_ingredient = self.incidence.tocsc()
         self.ingredient_to_recipes = defaultdict(set)
+        for col, ing in enumerate(self.store.vocabulary):
+            rows = by_ingredient.indices[by_ingredient.indptr[col]:by_ingredient.indptr[col + 1]]
+            self.ingredient_to_recipes[ing] = set(self.recipe_order[rows].tolist())
 
-        for _, row in df.iterrows():
-            recipe_id = row['id']
-            ingredients = row['ingredients_list']
+    @property
+    def graph(self):
+        """
+        The similarity graph as a networkx.Graph (recipe ids as nodes, 'weight' = shared ingredients), for analytics
+        and export. The CSR backend builds it on the first access and keeps it until the graph changes; queries use
+        self.adjacency instead.
+        """
+        return self.adjacency.to_networkx()
 
-            # Store ingredients for this recipe
-            self.recipe_ingredients[recipe_id] = ingredients
+    @property
+    def recipe_order(self):
+        """Recipe ids in row order (order of the recipe dataframe)"""
+        return self.store.recipe_ids
 
-            # Build reverse mapping
-            for ing in ingredients:
-                self.ingredient_to_recipes[ing].add(recipe_id)
+    @property
+    def recipe_row(self):
+        """{recipe_id: row}"""
+        return self.store.row_of
 
-        if self.debug:
-            print("Building similarity graph...")
-            print(f"Total unique ingredients: {len(self.ingredient_to_recipes)}")
+    @property
+    def ingredient_index(self):
+        """{ingredient: column in the incidence matrix}"""
+        return self.store.ingredient_index
+
+    def memory_report(self):
+        """Memory of the recipe store compared to plain per-field dicts, as a printable table"""
+        return format_memory_report(memory_report(self.store))
+
+    def _add_edges_sparse(self, min_shared_ingredients, chunk_size):
+        """Add edges from X·Xᵀ computed in row chunks of the recipes x ingredients incidence matrix"""
+        for rows, cols, weights in shared_ingredient_edges(self.incidence, min_shared_ingredients, chunk_size):
+            self.adjacency.add_edges(rows, cols, weights)
 
-        # Create the graph
-        self.graph = nx.Graph()
-        self.graph.add_nodes_from(df['id'])
+    def _add_edges_minhash(self, min_shared_ingredients, bands, rows):
+        """Add the edges of the verified MinHash LSH candidate pairs"""
+        first, second, weights, n_candidates = lsh_edges(self.incidence, min_shared_ingredients, bands, rows, seed=self.random_state)
+        self.adjacency.add_edges(first, second, weights)
+
+        if self.debug:
+            print(f"MinHash LSH ({bands} bands x {rows} rows): {n_candidates} candidate pairs, {len(weights)} edges kept")
 
+    def _add_edges_combinations(self, min_shared_ingredients):
+        """Add edges by counting every recipe pair of every ingredient"""
         # Add edges between recipes that share ingredients
         edge_weights = defaultdict(int)
 
@@ -196,20 +416,172 @@ class GraphManager():
                     edge_weights[(r1, r2)] += 1
 
         # Add edges with sufficient weight
-        edges_added = 0
-        for (r1, r2), weight in edge_weights.items():
-            if weight >= min_shared_ingredients:
-                self.graph.add_edge(r1, r2, weight=weight)
-                edges_added += 1
+        kept = [(self.recipe_row[r1], self.recipe_row[r2], weight) for (r1, r2), weight in edge_weights.items() if weight >= min_shared_ingredients]
+        if kept:
+            self.adjacency.add_edges(*(np.array(column) for column in zip(*kept)))
+
+    def to_csr(self):
+        """
+        Adjacency of the similarity graph as a symmetric CSR matrix of shared ingredient counts, rows follow recipe_order.
+        Column indices are not necessarily sorted within a row (the CSR backend keeps them in weight order).
+        """
+        return self.adjacency.to_csr()
+
+    def _source_files(self):
+        return [os.path.join(self.data_path, "RAW_recipes.csv"), os.path.join(self.data_path, "RAW_interactions.csv")]
+
+    def _build_params(self):
+        """Parameters that change the content of the graph (the exact build methods and the chunk size do not)"""
+        params = {
+            'nrows': self.nrows,
+            'min_shared_ingredients': self.min_shared_ingredients,
+            'randomized_recipes': self.randomized_recipes,
+            'sample_method': self.sample_method,
+            'random_state': self.random_state,
+            'rating_prior_weight': self.rating_prior_weight
+        }
+        if self.build_method == 'minhash':  # approximate graph, depends on the LSH parameters
+            params.update({'build_method': 'minhash', 'lsh_bands': self.lsh_bands, 'lsh_rows': self.lsh_rows})
+        if self.canonicalize:
+            params.update({'canonicalize': True, 'rules': RULES_VERSION, 'synonyms': self._synonyms_digest(),
+                           'near_duplicate_threshold': self.near_duplicate_threshold})
+        return params
+
+    def save(self, path):
+        """
+        Write a versioned binary snapshot of the graph and all recipe data to the directory path.
+        Arrays are stored as .npy files (the recipe store columns, the adjacency in CSR form, names as a utf-8 blob with offsets,
+        the top-k index if there is one) together with a hash of the source CSVs and the build parameters.
+        """
+        arrays = self.store.to_arrays()
+        arrays['name_offsets'], arrays['name_blob'] = snapshot.pack_strings([self.id_to_name[rid] for rid in self.recipe_order.tolist()])
+        arrays['adjacency_indptr'], arrays['adjacency_indices'], arrays['adjacency_weights'] = self.adjacency.to_arrays()
+
+        meta = {
+            'params': self._build_params(),
+            'sources': snapshot.describe_sources(self._source_files()),
+            'data_path': self.data_path,
+            'synonyms_path': self.synonyms_path,
+            'canonicalization': self.canonicalization_report,
+            'adjacency_order': 'weight'  # rows sorted like CSRAdjacency, loaded without re-sorting
+        }
+        if self.topk_index is not None:
+            arrays.update(self.topk_index.to_arrays())
+            meta['topk'] = self._topk_meta()
+        snapshot.write_snapshot(path, arrays, meta)
 
         if self.debug:
-            print(f"Graph built: {self.graph.number_of_nodes()} nodes, {self.graph.number_of_edges()} edges")
-            print(f"Minimum shared ingredients threshold: {min_shared_ingredients}")
+            print(f"Snapshot written to {path}")
+
+    @classmethod
+    @metrics.timed('load_snapshot')
+    def load(cls, path, debug=False, mmap=True, cache_size=1024, cache_ttl=600.0, graph_backend='csr', topk_depth=None):
+        """
+        Restore a GraphManager from a snapshot written by save(); the large arrays are memory-mapped by default.
+        A top-k index stored in the snapshot is memory-mapped too. With topk_depth, an index that is missing, shallower
+        or lacks INDEXED_NORMALIZATIONS is built and added to the snapshot, so only the first load pays for it.
+        """
+        meta = snapshot.read_meta(path)
+        if meta is None:
+            raise ValueError(f"No snapshot of version {snapshot.SNAPSHOT_VERSION} found at {path}")
+        arrays = snapshot.read_arrays(path, meta, mmap=mmap)
+
+        self = cls.__new__(cls)
+        params = meta['params']
+        self.nrows = params['nrows']
+        self.min_shared_ingredients = params['min_shared_ingredients']
+        self.randomized_recipes = params['randomized_recipes']
+        self.sample_method = params['sample_method']
+        self.random_state = params['random_state']
+        self.rating_prior_weight = params['rating_prior_weight']
+        self.build_method = params.get('build_method', 'sparse')
+        self.lsh_bands = params.get('lsh_bands', 32)
+        self.lsh_rows = params.get('lsh_rows', 2)
+        self.canonicalize = params.get('canonicalize', False)
+        self.near_duplicate_threshold = params.get('near_duplicate_threshold', 0.8)
+        self.synonyms_path = meta.get('synonyms_path')
+        self.canonicalization_report = meta.get('canonicalization')
+        self._canonicalizer = None
+        self.data_path = meta['data_path']
+        self.graph_backend = graph_backend
+        self.debug = debug
+
+        self.store = RecipeStore.from_arrays(arrays)
+        recipe_ids = self.recipe_order.tolist()
+        self.recipe_ids_in_graph = set(recipe_ids)
+        self.topk_index = None
+        self.analytics = RecipeAnalytics.load(os.path.join(path, ANALYTICS_DIR))  # written by python -m recommender.graph_analytics
+        self._idf_incidence = None
+        self._ingredient_bitmaps = None
+        self.recommendation_cache = LRUCache(cache_size, cache_ttl)
+        self._build_name_lookup(dict(zip(recipe_ids, snapshot.unpack_strings(arrays['name_offsets'], arrays['name_blob']))))
+
+        self.incidence = build_incidence_matrix(self.store.ingredient_offsets, self.store.ingredient_values, len(self.store.vocabulary))
+        self._build_ingredient_to_recipes()
+
+        # The CSR backend wraps the (memory-mapped) adjacency arrays, the NetworkX backend rebuilds its graph from them
+        self.adjacency = backend_class(graph_backend).from_csr(self.recipe_order, arrays['adjacency_indptr'], arrays['adjacency_indices'], arrays['adjacency_weights'],
+                                                               sorted_by_weight=meta.get('adjacency_order') == 'weight')
+
+        topk = meta.get('topk')
+        if topk is not None and (not topk_depth or (topk['depth'] >= topk_depth and set(cls.INDEXED_NORMALIZATIONS) <= set(topk['normalizations']))):
+            self.topk_index = TopKIndex.from_arrays(arrays, topk['normalizations'], topk['depth'])
+        elif topk_depth:
+            self.build_topk_index(depth=topk_depth)
+            try:
+                snapshot.add_arrays(path, self.topk_index.to_arrays(), {'topk': self._topk_meta()})
+            except OSError as e:  # read-only snapshot: keep the index in memory only
+                if self.debug:
+                    print(f"Could not add the top-k index to the snapshot at {path}: {e}")
+
+        if self.debug:
+            print(f"Snapshot loaded from {path}: {self.adjacency.number_of_nodes()} nodes, {self.adjacency.number_of_edges()} edges")
+        return self
+
+    def _topk_meta(self):
+        return {'depth': self.topk_index.depth, 'normalizations': sorted(int(norm) for norm in self.topk_index.neighbors)}
+
+    @classmethod
+    def load_or_build(cls, snapshot_path=None, **kwargs):
+        """
+        Load the snapshot at snapshot_path (default: <data_path>/snapshot) if it matches the source CSVs
+        and build parameters, otherwise build the graph from the CSVs and write a fresh snapshot.
+        Accepts the same keyword arguments as GraphManager().
+        """
+        data_path = kwargs.get('data_path', 'archive/')
+        debug = kwargs.get('debug', False)
+        if snapshot_path is None:
+            snapshot_path = os.path.join(data_path, "snapshot")
+
+        meta = snapshot.read_meta(snapshot_path)
+        if meta is not None:
+            # an unbuilt instance carrying the requested parameters (constructor defaults for the missing ones)
+            probe = cls.__new__(cls)
+            defaults = {name: param.default for name, param in inspect.signature(cls.__init__).parameters.items()
+                        if param.default is not inspect.Parameter.empty}
+            probe.__dict__.update(defaults, **kwargs)
+            if meta['params'] == probe._build_params() and snapshot.snapshot_sources_match(snapshot_path, meta, probe._source_files()):
+                metrics.count('snapshot_hits')
+                return cls.load(snapshot_path, debug=debug, **{key: kwargs[key] for key in ('cache_size', 'cache_ttl', 'graph_backend', 'topk_depth') if key in kwargs})
+            if debug:
+                print(f"Snapshot at {snapshot_path} is stale, rebuilding...")
+
+        metrics.count('snapshot_misses')
+        self = cls(**kwargs)
+        self.save(snapshot_path)
+        return self
 
     def get_recipe_ingredients(self, recipe_id: int):
         """Get the ingredients for a specific recipe"""
-        return self.recipe_ingredients.get(recipe_id, [])
+        row = self.recipe_row.get(recipe_id)
+        return self.store.ingredients(row) if row is not None else []
+
+    def get_ingredient_count(self, recipe_id: int):
+        """Number of listed ingredients of a recipe, without decoding them"""
+        row = self.recipe_row.get(recipe_id)
+        return int(self.store.ingredient_offsets[row + 1] - self.store.ingredient_offsets[row]) if row is not None else 0
 
+    @metrics.timed('find_recipe_by_name')
     def find_recipe_by_name(self, query, max_suggestions=5):
         """Find recipe ID by name with fuzzy matching"""
         query_lower = query.lower().strip()
@@ -218,17 +590,32 @@ class GraphManager():
         if query_lower in self.name_to_id:
             return self.name_to_id[query_lower], query
 
-        # Fuzzy match with difflib (Levenshtein distance)
-        recipe_names = list(self.name_to_id.keys())
-        matches = get_close_matches(query_lower, recipe_names, n=max_suggestions)
+        # Fuzzy match: trigram candidates re-scored with difflib (see NameIndex)
+        matches = self.name_index.suggest(query_lower, n=max_suggestions)
 
         if matches:
             return None, matches  # Return suggestions
         else:
             return None, []
 
+    def autocomplete(self, prefix, max_suggestions=10):
+        """Recipe names starting with prefix (lowercase), for search-as-you-type"""
+        return self.name_index.complete(prefix.lower().strip(), n=max_suggestions)
+
     def get_avg_recipe_rating(self, recipe_id: int):
-        return self.id_to_rating.get(recipe_id)
+        row = self.recipe_row.get(recipe_id)
+        if row is None or np.isnan(self.store.rating[row]):
+            return None
+        return float(self.store.rating[row])
+
+    def get_smoothed_recipe_rating(self, recipe_id: int):
+        """Bayesian-smoothed average rating: few ratings are pulled towards the dataset average"""
+        row = self.recipe_row.get(recipe_id)
+        return float(self.store.smoothed_rating[row]) if row is not None else None
+
+    def get_rating_count(self, recipe_id: int):
+        row = self.recipe_row.get(recipe_id)
+        return int(self.store.rating_count[row]) if row is not None else 0
 
     def calculate_similarity_score(self, normalization_type: int, neighbor: int, recipe_id: int):
         """
@@ -236,27 +623,393 @@ class GraphManager():
         0: shared ingredients
         1: shared ingredients / all neighbors ingredients
         2: (shared ingredients / all neighbors ingredients) + (neighbors rating / 5)
+        3: sum of the IDF of the shared ingredients (rare ingredients count more than salt or butter)
+        4: Jaccard, shared ingredients / ingredients of either recipe
+        5: cosine, shared ingredients / sqrt(ingredients of recipe * ingredients of neighbor)
+        Scores 3-5 use the distinct ingredients of the incidence matrix, see neighbor_scores.
         """
 
-        weight = self.graph[recipe_id][neighbor]['weight']
+        weight = self.adjacency.weight(self.recipe_row[recipe_id], self.recipe_row[neighbor])
 
         match normalization_type:
             case 0:  # weight -> nr of shared ingredients
                 return weight
 
             case 1:  # normalized by total nr of ingredients
-                neighbor_ingredients = len(self.get_recipe_ingredients(neighbor))
+                neighbor_ingredients = self.get_ingredient_count(neighbor)
                 return weight / neighbor_ingredients
 
             case 2:  # total nr of ingredients + normalization of rating
-                neighbor_ingredients = len(self.get_recipe_ingredients(neighbor))
+                neighbor_ingredients = self.get_ingredient_count(neighbor)
                 similarity = weight / neighbor_ingredients
-                rating = self.get_avg_recipe_rating(neighbor)
+                rating = self.get_avg_recipe_rating(neighbor) or 0.0  # unrated recipes count as 0
                 return similarity + (rating / 5.0)  # /5 is normalization for rating
 
+            case 3 | 4 | 5:
+                neighbor_row = np.array([self.recipe_row[neighbor]])
+                return float(self.neighbor_scores(neighbor_row, [weight], normalization_type, rows=self.recipe_row[recipe_id])[0])
+
             case _:
                 return weight
 
+    def edge_scores(self, adjacency, normalization_type: int, rows=None):
+        """
+        Vectorized calculate_similarity_score for every edge of a CSR adjacency whose columns follow recipe_order.
+        rows are the recipe rows of the adjacency rows, by default the adjacency is the whole graph (row i is recipe row i).
+        Returns a float64 array aligned with adjacency.indices.
+        """
+        rows = np.arange(adjacency.shape[0]) if rows is None else np.asarray(rows)
+        edge_rows = np.repeat(rows, np.diff(adjacency.indptr))
+        return self.neighbor_scores(np.asarray(adjacency.indices), adjacency.data, normalization_type, rows=edge_rows)
+
+    def neighbor_scores(self, neighbors, weights, normalization_type: int, rows=None):
+        """
+        Vectorized calculate_similarity_score for arrays of neighbor rows and edge weights.
+        rows is the row of the recipe the neighbors belong to (one row, or one per neighbor); only types 3-5 need it.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if normalization_type in (3, 4, 5):
+            if rows is None:
+                raise ValueError(f"Normalization type {normalization_type} needs the rows of the scored recipes")
+            rows = np.broadcast_to(rows, np.shape(neighbors))
+
+        match normalization_type:
+            case 0:
+                return weights
+
+            case 1:
+                return weights / self.store.ingredient_counts()[neighbors]
+
+            case 2:
+                ratings = np.nan_to_num(self.store.rating)
+                return weights / self.store.ingredient_counts()[neighbors] + ratings[neighbors] / 5.0
+
+            case 3:  # IDF weighted overlap, from the incidence matrix instead of per-neighbor set math
+                return weighted_overlap(self.incidence, self.idf_incidence(), rows, neighbors)
+
+            case 4:  # Jaccard: |A & B| / |A | B|
+                sizes = self.ingredient_set_sizes()
+                return weights / (sizes[rows] + sizes[neighbors] - weights)
+
+            case 5:  # cosine of the binary ingredient vectors: |A & B| / sqrt(|A| |B|)
+                sizes = self.ingredient_set_sizes()
+                return weights / np.sqrt(sizes[rows] * sizes[neighbors])
+
+            case _:
+                return weights
+
+    def ingredient_set_sizes(self):
+        """Number of distinct ingredients of every recipe row (row sums of the binary incidence matrix)"""
+        return np.diff(self.incidence.indptr)
+
+    def idf_incidence(self):
+        """Incidence matrix with every ingredient column scaled by its IDF (see sparse_similarity.ingredient_idf), cached"""
+        if self._idf_incidence is None:
+            self._idf_incidence = sp.csr_matrix(self.incidence @ sp.diags(ingredient_idf(self.incidence)))
+        return self._idf_incidence
+
+    def ingredient_bitmaps(self):
+        """Per-ingredient bitsets over the recipe rows (see ingredient_bitmaps.IngredientBitmaps), cached"""
+        if self._ingredient_bitmaps is None:
+            self._ingredient_bitmaps = ingredient_bitmaps.IngredientBitmaps(self.incidence)
+        return self._ingredient_bitmaps
+
+    def constraint_mask(self, include_ingredients=None, exclude_ingredients=None, max_minutes=None, min_rating=None, min_rating_count=None):
+        """
+        Bitset of the recipe rows meeting every constraint (test rows with ingredient_bitmaps.test), None without constraints.
+        include_ingredients: uses all of them, exclude_ingredients: uses none of them, max_minutes: takes at most that long,
+        min_rating / min_rating_count: average rating / nr of ratings at least that (unrated recipes fail min_rating).
+        """
+        if not include_ingredients and not exclude_ingredients and max_minutes is None and min_rating is None and min_rating_count is None:
+            return None
+
+        bitmaps = self.ingredient_bitmaps()
+        mask = bitmaps.everything()
+        for ingredient in include_ingredients or ():
+            ingredient_id = self.ingredient_index.get(self.canonical_ingredient(ingredient))
+            if ingredient_id is None:
+                return bitmaps.nothing()  # no recipe uses it
+            mask &= bitmaps.bitmap(ingredient_id)
+        for ingredient in exclude_ingredients or ():
+            ingredient_id = self.ingredient_index.get(self.canonical_ingredient(ingredient))
+            if ingredient_id is not None:
+                mask &= ~bitmaps.bitmap(ingredient_id)
+
+        if max_minutes is not None or min_rating is not None or min_rating_count is not None:
+            rows = np.ones(len(self.store), dtype=bool)
+            if max_minutes is not None:
+                rows &= self.store.minutes <= max_minutes
+            if min_rating is not None:
+                rows &= self.store.rating >= min_rating  # NaN (unrated) compares False
+            if min_rating_count is not None:
+                rows &= self.store.rating_count >= min_rating_count
+            mask &= ingredient_bitmaps.pack(rows)
+        return mask
+
+    def build_topk_index(self, depth: int=50, normalization_types=INDEXED_NORMALIZATIONS):
+        """
+        Precompute the top-`depth` neighbors of every recipe for each normalization type, so switching between
+        types costs nothing at query time.
+        Must run after build_graph and load_ratings; recommend_similar_recipes uses it whenever top_k <= depth.
+        The IDF scores (CORPUS_NORMALIZATIONS) are left out by default and scored per query: adding or removing one
+        recipe changes the IDF of every ingredient, and so every one of their scores.
+        """
+        adjacency = self.to_csr()
+        edge_scores = {norm: self.edge_scores(adjacency, norm) for norm in normalization_types}
+        self.topk_index = TopKIndex.build(adjacency, edge_scores, depth=depth)
+
+        if self.debug:
+            print(f"Top-{depth} neighbor index built for normalization types {list(normalization_types)}")
+
+    def add_recipes(self, records):
+        """
+        Add recipes without rebuilding: records are dicts with 'id', 'name', 'ingredients' (list or list literal)
+        and optionally 'minutes', 'steps' and 'description'.
+        Edges are only computed against the recipes sharing an ingredient with a new recipe, and only the top-k
+        rows of the new recipes and their neighbors are refreshed. Recipes without a name or ingredients are skipped,
+        like in load_data; missing values (None / NaN, e.g. from DataFrame.to_dict('records')) get the load_data defaults.
+        All records are validated before anything changes, an invalid one raises ValueError and adds nothing.
+        Returns the ids of the added recipes.
+        """
+        new = []
+        for record in records:
+            clean = self._clean_record(record)
+            if clean is None:
+                continue
+            if clean[0] in self.recipe_row or any(clean[0] == other[0] for other in new):
+                raise ValueError(f"Recipe {clean[0]} is already in the graph")
+            new.append(clean)
+        if not new:
+            return []
+
+        ids = [recipe_id for recipe_id, *_ in new]
+        first_row = len(self.store)
+        self.store.append(ids, [r[2] for r in new], [r[3] for r in new], [r[4] for r in new], [r[5] for r in new])
+        start = self.store.ingredient_offsets[first_row]
+        new_incidence = build_incidence_matrix(self.store.ingredient_offsets[first_row:] - start, self.store.ingredient_values[start:], len(self.store.vocabulary))
+        self.incidence = append_rows(self.incidence, new_incidence)
+        self._idf_incidence = None
+        self._ingredient_bitmaps = None
+        self.recipe_ids_in_graph.update(ids)
+        self.adjacency.add_nodes(ids)
+        self.recommendation_cache.clear()
+
+        # names
+        for recipe_id, name, *_ in new:
+            self.id_to_name[recipe_id] = name
+            self.ids_by_name[name.lower()].append(recipe_id)
+        self.name_index.add({name.lower(): recipe_id for recipe_id, name, *_ in new})
+
+        # edges against the recipes sharing at least one ingredient: only the posting lists of the new recipes'
+        # ingredients take part in the product, pairs of two new recipes are kept once
+        for recipe_id, _, ingredients, *_ in new:
+            for ing in set(ingredients):
+                self.ingredient_to_recipes[ing].add(recipe_id)
+        shared = (new_incidence @ self.incidence.T).tocoo()
+        rows, cols = shared.row.astype(np.int64) + first_row, shared.col.astype(np.int64)
+        keep = (shared.data >= self.min_shared_ingredients) & ((cols < first_row) | (cols > rows))
+        self.adjacency.add_edges(rows[keep], cols[keep], shared.data[keep])
+        touched = set(ids) | set(self.recipe_order[cols[keep]].tolist())
+
+        if self.topk_index is not None:
+            self.topk_index.append_rows(len(ids))
+            self._drop_corpus_normalizations()
+            self._refresh_topk_rows(touched)
+
+        if self.debug:
+            print(f"Added {len(ids)} recipes, {len(touched) - len(ids)} existing recipes got new neighbors")
+        return ids
+
+    def _clean_record(self, record):
+        """(id, name, ingredients, minutes, steps, description) of an add_recipes record, None if it is skipped"""
+        def missing(value):
+            return value is None or (np.ndim(value) == 0 and pd.isna(value))
+
+        absent = [key for key in ('id', 'name', 'ingredients') if key not in record]
+        if absent:
+            raise ValueError(f"Recipe record {record!r} lacks {', '.join(absent)}")
+        recipe_id = record['id']
+        if missing(recipe_id) or isinstance(recipe_id, bool) or not isinstance(recipe_id, (int, float, np.number)) or recipe_id != int(recipe_id):
+            raise ValueError(f"Recipe id {recipe_id!r} is not an integer")
+        recipe_id = int(recipe_id)
+
+        name = record['name']
+        if missing(name) or name == "":
+            return None
+        if not isinstance(name, str):
+            raise ValueError(f"Recipe {recipe_id}: name {name!r} is not a string")
+
+        ingredients = record['ingredients']
+        if missing(ingredients):
+            ingredients = []
+        elif isinstance(ingredients, str):
+            ingredients = self._parse_ingredients(ingredients)
+        else:
+            ingredients = [ing.lower().strip() for ing in ingredients if isinstance(ing, str)]
+        if self.canonicalize:
+            ingredients = self.canonicalizer().canonical_list(ingredients)
+        if not ingredients:
+            return None
+
+        minutes = record.get('minutes')
+        if missing(minutes):
+            minutes = 0
+        elif isinstance(minutes, bool) or not isinstance(minutes, (int, float, np.number)) or not np.isfinite(minutes):
+            raise ValueError(f"Recipe {recipe_id}: minutes {minutes!r} is not a number")
+
+        steps = record.get('steps')
+        if missing(steps):
+            steps = []
+        elif isinstance(steps, str):
+            steps = self._parse_steps(steps)
+        else:
+            steps = [step.strip() for step in steps if isinstance(step, str)]
+
+        description = record.get('description')
+        if missing(description) or description == "":
+            description = "No description available."
+        elif not isinstance(description, str):
+            raise ValueError(f"Recipe {recipe_id}: description {description!r} is not a string")
+
+        return recipe_id, name, ingredients, int(minutes), steps, description
+
+    def remove_recipe(self, recipe_id: int):
+        """Remove a recipe, its edges and its name; only the top-k rows of its former neighbors are recomputed"""
+        row = self.recipe_row.get(recipe_id)
+        if row is None:
+            raise KeyError(recipe_id)
+
+        neighbors = self.recipe_order[self.adjacency.neighbors(row)[0]].tolist()
+        self.adjacency.remove_node(row)
+        self.recommendation_cache.clear()
+        self.recipe_ids_in_graph.discard(recipe_id)
+        for ing in set(self.get_recipe_ingredients(recipe_id)):
+            self.ingredient_to_recipes[ing].discard(recipe_id)
+            if not self.ingredient_to_recipes[ing]:
+                del self.ingredient_to_recipes[ing]
+
+        # names: the lowercase name goes to the last other recipe of that name, like in load_data
+        name = self.id_to_name.pop(recipe_id).lower()
+        others = self.ids_by_name[name]
+        others.remove(recipe_id)
+        if not others:
+            del self.ids_by_name[name]
+        if self.name_to_id.get(name) == recipe_id:
+            self.name_index.remove(name)
+            if others:
+                self.name_index.add({name: others[-1]})
+
+        # rows after the removed one move up by one
+        self.store.delete(row)
+        self.incidence = delete_row(self.incidence, row)
+        self._idf_incidence = None
+        self._ingredient_bitmaps = None
+        if self.topk_index is not None:
+            keep = np.ones(len(self.store) + 1, dtype=bool)
+            keep[row] = False
+            self.topk_index.select_rows(keep)
+            self._drop_corpus_normalizations()
+            self._refresh_topk_rows(neighbors)
+
+    def apply_ratings(self, delta):
+        """
+        Ingest new ratings: delta is an iterable of (recipe_id, rating) pairs or a DataFrame with recipe_id and rating columns.
+        Ratings of recipes outside the graph are ignored. Only the rows of the rated recipes' neighbors are re-ranked.
+        Ratings must be whole numbers (stars), fractional or missing ones raise ValueError and nothing is applied.
+        """
+        if isinstance(delta, pd.DataFrame):
+            delta = zip(delta['recipe_id'].tolist(), delta['rating'].tolist())
+        pairs = [(self.recipe_row[rid], rating) for rid, rating in delta if rid in self.recipe_row]
+        if not pairs:
+            return
+
+        rows, ratings = zip(*pairs)
+        self.store.add_ratings(rows, ratings)
+        self.recommendation_cache.clear()  # ratings are part of every record
+
+        if self.topk_index is not None:
+            rated = set(self.recipe_order[list(rows)].tolist())
+            affected = {neighbor for rid in rated for neighbor in self.recipe_order[self.adjacency.neighbors(self.recipe_row[rid])[0]].tolist()}
+            self._refresh_topk_rows(affected, normalization_types=[norm for norm in self.topk_index.neighbors if norm in self.RATING_NORMALIZATIONS])
+
+    def _refresh_topk_rows(self, recipe_ids, normalization_types=None):
+        """Recompute the top-k index rows of the given recipes from their current neighbors"""
+        if normalization_types is None:
+            normalization_types = list(self.topk_index.neighbors)
+        for recipe_id in recipe_ids:
+            row = self.recipe_row[recipe_id]
+            neighbor_rows, weights = self.adjacency.neighbors(row)
+            for norm in normalization_types:
+                self.topk_index.set_row(row, norm, neighbor_rows, self.neighbor_scores(neighbor_rows, weights, norm, rows=row))
+
+    def _drop_corpus_normalizations(self):
+        """
+        Adding or removing recipes changes every ingredient's IDF and so every IDF score: instead of re-ranking all rows,
+        IDF rankings built on request are dropped from the index and scored per query from then on
+        """
+        for norm in self.CORPUS_NORMALIZATIONS:
+            self.topk_index.neighbors.pop(norm, None)
+            self.topk_index.scores.pop(norm, None)
+
+    def check_consistency(self):
+        """
+        Compare the incrementally updated state with a from-scratch build over the same recipes:
+        incidence matrix, ingredient_to_recipes, edges, name lookup, ratings and the top-k index.
+        Returns a list of differences (empty if consistent).
+        """
+        problems = []
+        incidence = build_incidence_matrix(self.store.ingredient_offsets, self.store.ingredient_values, len(self.store.vocabulary))
+        if incidence.shape != self.incidence.shape:
+            problems.append(f"incidence matrix is {self.incidence.shape[0]} x {self.incidence.shape[1]}, the recipe store needs {incidence.shape[0]} x {incidence.shape[1]}")
+            return problems  # the other checks compare against the incidence
+        if (incidence != self.incidence).nnz:
+            problems.append("incidence matrix differs")
+
+        expected_postings = defaultdict(set)
+        for rid in self.recipe_order.tolist():
+            for ing in self.get_recipe_ingredients(rid):
+                expected_postings[ing].add(rid)
+        actual_postings = {ing: rids for ing, rids in self.ingredient_to_recipes.items() if rids}
+        if expected_postings != actual_postings:
+            problems.append("ingredient_to_recipes differs")
+
+        if not np.array_equal(self.adjacency.recipe_ids, self.recipe_order) or self.adjacency.number_of_nodes() != len(self.store):
+            problems.append("graph nodes differ from the recipe store")
+        expected_edges = {}
+        for rows, cols, weights in shared_ingredient_edges(incidence, self.min_shared_ingredients):
+            for r1, r2, w in zip(self.recipe_order[rows].tolist(), self.recipe_order[cols].tolist(), weights.tolist()):
+                expected_edges[frozenset((r1, r2))] = w
+        rows, cols, weights = self.adjacency.edges()
+        actual_edges = {frozenset((r1, r2)): w for r1, r2, w in zip(self.recipe_order[rows].tolist(), self.recipe_order[cols].tolist(), weights.tolist())}
+        if self.build_method == 'minhash':
+            # approximate graph: edges may be missing, but every edge must be a true edge with its exact weight
+            wrong = [edge for edge, w in actual_edges.items() if expected_edges.get(edge) != w]
+            if wrong:
+                problems.append(f"edges differ: {len(wrong)} edges are not shared ingredient edges or have a wrong weight")
+        elif expected_edges != actual_edges:
+            problems.append(f"edges differ: {len(expected_edges.keys() ^ actual_edges.keys())} edges missing or extra")
+
+        expected_ids = defaultdict(list)
+        for rid in self.recipe_order.tolist():
+            expected_ids[self.id_to_name[rid].lower()].append(rid)
+        expected_names = {name: ids[-1] for name, ids in expected_ids.items()}
+        if expected_names != self.name_to_id or sorted(expected_names) != self.name_index.sorted_names or expected_ids != self.ids_by_name:
+            problems.append("name lookup differs")
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            expected_rating = np.where(self.store.rating_count > 0, self.store.rating_sum / self.store.rating_count, np.nan)
+        if not np.allclose(expected_rating, self.store.rating, equal_nan=True):
+            problems.append("ratings differ from their sums and counts")
+
+        if self.topk_index is not None:
+            adjacency = self.to_csr()
+            fresh = TopKIndex.build(adjacency, {norm: self.edge_scores(adjacency, norm) for norm in self.topk_index.neighbors}, self.topk_index.depth)
+            for norm in fresh.scores:
+                if not np.allclose(fresh.scores[norm], self.topk_index.scores[norm], equal_nan=True):
+                    problems.append(f"top-k index differs for normalization type {norm}")
+
+        return problems
+
     def get_shared_ingredients(self, recipe_id1: int, recipe_id2: int):
         """Get the list of ingredients shared between two recipes"""
         ingredients_1 = set(self.get_recipe_ingredients(recipe_id1))
@@ -265,19 +1018,150 @@ class GraphManager():
     
     def get_instructions(self, recipe_id: int):
         """Returns a list of instructions (steps) for a recipe."""
-        return self.recipe_instructions.get(recipe_id, ["No instructions available."])
+        row = self.recipe_row.get(recipe_id)
+        return self.store.steps(row) if row is not None else ["No instructions available."]
 
     def get_minutes(self, recipe_id: int):
         """Returns the estimated time in minutes for a recipe."""
-        return self.recipe_minutes.get(recipe_id, 0)
+        row = self.recipe_row.get(recipe_id)
+        return int(self.store.minutes[row]) if row is not None else 0
 
     def get_description(self, recipe_id: int):
         """Returns the description of a recipe."""
-        return self.recipe_descriptions.get(recipe_id, "No description available.")
+        row = self.recipe_row.get(recipe_id)
+        return self.store.description(row) if row is not None else "No description available."
+
+    @metrics.timed('score_neighbors')
+    def score_neighbors(self, recipe_id: int, top_k: int=10, normalization_type: int=0, mask=None):
+        """
+        Light scoring pass: the top-k neighbors of a recipe as a list of (neighbor_id, similarity_score), best first.
+        No recipe data is fetched; pass the result to hydrate() to get the full records.
+        mask is an optional bitset from constraint_mask(): only the neighbors it contains are ranked.
+        """
+        if not recipe_id in self.recipe_row:
+            return []
+        if mask is not None:
+            return self._score_constrained(recipe_id, top_k, normalization_type, mask)
+
+        if self.topk_index is not None and self.topk_index.covers(normalization_type, top_k):
+            # O(top_k) slice of the precomputed ranking
+            rows, scores = self.topk_index.query(self.recipe_row[recipe_id], normalization_type, top_k)
+            metrics.count('topk_index_hits')
+            metrics.count('neighbors_scored', len(rows))
+            return list(zip(self.recipe_order[rows].tolist(), scores.tolist()))
+
+        metrics.count('topk_index_misses')
+        row = self.recipe_row[recipe_id]
+        neighbor_rows, weights = self.adjacency.neighbors(row)
+        if normalization_type == 0 and self.adjacency.sorted_by_weight:
+            # rows sorted by weight: the best neighbors by shared ingredients are the first ones
+            metrics.count('neighbors_scored', min(top_k, len(neighbor_rows)))
+            return list(zip(self.recipe_order[neighbor_rows[:top_k]].tolist(), weights[:top_k].astype(np.float64).tolist()))
+
+        # all neighbors scored at once
+        metrics.count('neighbors_scored', len(neighbor_rows))
+        scores = self.neighbor_scores(neighbor_rows, weights, normalization_type, rows=row)
+        return self._best_neighbors(neighbor_rows, scores, top_k)
+
+    def _best_neighbors(self, neighbor_rows, scores, top_k):
+        """The top_k (neighbor_id, score) by decreasing score, ties by row like the top-k index"""
+        best = best_positions(neighbor_rows, scores, top_k)
+        return list(zip(self.recipe_order[neighbor_rows[best]].tolist(), scores[best].tolist()))
+
+    def _score_constrained(self, recipe_id, top_k, normalization_type, mask):
+        """score_neighbors restricted to the neighbors in the mask, filtered before the top-k cut"""
+        row = self.recipe_row[recipe_id]
+
+        if self.topk_index is not None and normalization_type in self.topk_index.neighbors:
+            # the indexed ranking is exact as long as top_k neighbors pass, or the row holds all neighbors
+            rows, scores = self.topk_index.query(row, normalization_type, self.topk_index.depth)
+            keep = ingredient_bitmaps.test(mask, rows)
+            if np.count_nonzero(keep) >= top_k or len(rows) < self.topk_index.depth:
+                metrics.count('topk_index_hits')
+                return list(zip(self.recipe_order[rows[keep][:top_k]].tolist(), scores[keep][:top_k].tolist()))
+
+        # every neighbor goes through the bitset, only the survivors are scored
+        metrics.count('topk_index_misses')
+        neighbor_rows, weights = self.adjacency.neighbors(row)
+        keep = ingredient_bitmaps.test(mask, neighbor_rows)
+        metrics.count('neighbors_scored', int(np.count_nonzero(keep)))
+        neighbor_rows, weights = neighbor_rows[keep], weights[keep]
+        scores = self.neighbor_scores(neighbor_rows, weights, normalization_type, rows=row)
+        return self._best_neighbors(neighbor_rows, scores, top_k)
+
+    def diverse_neighbors(self, recipe_id: int, top_k: int=10, normalization_type: int=0, max_per_community: int=1,
+                          candidates_per_result: int=5, mask=None):
+        """
+        score_neighbors spread over the label propagation communities of the analytics: the best
+        top_k * candidates_per_result neighbors are cut greedily to at most max_per_community per community
+        (see graph_analytics.diversify), so one cluster of near-duplicate recipes does not fill the whole list.
+        """
+        if self.analytics is None:
+            raise ValueError("Community-diverse recommendations need the graph analytics, run python -m recommender.graph_analytics")
+        candidates = self.score_neighbors(recipe_id, top_k * candidates_per_result, normalization_type, mask=mask)
+        communities = self.analytics.get('community', [neighbor for neighbor, _ in candidates])
+        return diversify(candidates, communities, top_k, max_per_community)
+
+    @metrics.timed('hydrate')
+    def hydrate(self, ranked, recipe_id: int=None):
+        """
+        Build the full recommendation records for a list of (neighbor_id, similarity_score) as returned by score_neighbors.
+        Shared ingredients are computed against recipe_id, they are empty if no recipe_id is given.
+        """
+        records = []
+        for neighbor, similarity in ranked:
+            records.append({
+                'id': neighbor,
+                'name': self.id_to_name.get(neighbor, f"Recipe {neighbor}"),
+                'similarity_score': similarity,
+                'ingredients': self.get_recipe_ingredients(neighbor),
+                'shared_ingredients': self.get_shared_ingredients(recipe_id, neighbor) if recipe_id is not None else [],
+                'rating': self.get_avg_recipe_rating(neighbor),
+                'instructions': self.get_instructions(neighbor),
+                'minutes': self.get_minutes(neighbor),
+                'description': self.get_description(neighbor)
+            })
+        return records
 
-    def recommend_similar_recipes(self, recipe_id: int, top_k: int =10, normalization_type: int=0):
+    @metrics.timed('recommend_batch')
+    def recommend_batch(self, recipe_ids, top_k: int=10, normalization_type: int=0):
+        """
+        score_neighbors for many recipes at once: a list with one [(neighbor_id, similarity_score), ...] per query
+        (empty for unknown recipes). Served from the top-k index when it is deep enough, otherwise the query rows of the
+        CSR adjacency are scored and ranked together with array operations.
+        """
+        known = [recipe_id in self.recipe_row for recipe_id in recipe_ids]
+        rows = np.array([self.recipe_row[recipe_id] for recipe_id, ok in zip(recipe_ids, known) if ok], dtype=np.int64)
+
+        if self.topk_index is not None and self.topk_index.covers(normalization_type, top_k):
+            neighbors = self.topk_index.neighbors[normalization_type][rows, :top_k]
+            scores = self.topk_index.scores[normalization_type][rows, :top_k]
+        else:
+            queries = self.to_csr()[rows]
+            ranked = TopKIndex.build(queries, {normalization_type: self.edge_scores(queries, normalization_type, rows=rows)}, depth=top_k)
+            neighbors, scores = ranked.neighbors[normalization_type], ranked.scores[normalization_type]
+
+        ranked_rows = iter(zip(neighbors, scores))
+        results = []
+        for ok in known:
+            if not ok:
+                results.append([])
+                continue
+            row_neighbors, row_scores = next(ranked_rows)
+            valid = row_neighbors >= 0
+            results.append(list(zip(self.recipe_order[row_neighbors[valid]].tolist(), row_scores[valid].tolist())))
+        return results
+
+    @metrics.timed('recommend_similar_recipes')
+    def recommend_similar_recipes(self, recipe_id: int, top_k: int =10, normalization_type: int=0, include_ingredients=None,
+                                  exclude_ingredients=None, max_minutes=None, min_rating=None, min_rating_count=None,
+                                  max_per_community=None):
         """
         Get top-k most similar recipes to the given recipe.
+        Shortcut for hydrate(score_neighbors(...), recipe_id), memoized in recommendation_cache.
+        The optional constraints (see constraint_mask) are applied before the top-k cut, so up to top_k matching
+        recipes are returned, e.g. exclude_ingredients=['peanuts'], max_minutes=30.
+        max_per_community spreads the list over graph communities (see diverse_neighbors), it needs the analytics.
         Returned as a JSON array with the following structure:
             'id': neighbor,
             'name': recipe_name,
@@ -289,37 +1173,82 @@ class GraphManager():
             'minutes': minutes,
             'description': description
         """
+        key = (recipe_id, normalization_type, top_k)
+        constraints = (frozenset(include_ingredients or ()), frozenset(exclude_ingredients or ()), max_minutes, min_rating, min_rating_count, max_per_community)
+        if constraints != (frozenset(), frozenset(), None, None, None, None):
+            key += constraints
+        records = self.recommendation_cache.get(key)
+        if records is None:
+            metrics.count('recommendation_cache_misses')
+            mask = self.constraint_mask(include_ingredients, exclude_ingredients, max_minutes, min_rating, min_rating_count)
+            if max_per_community:
+                ranked = self.diverse_neighbors(recipe_id, top_k, normalization_type, max_per_community, mask=mask)
+            else:
+                ranked = self.score_neighbors(recipe_id, top_k, normalization_type, mask=mask)
+            records = self.hydrate(ranked, recipe_id)
+            self.recommendation_cache.put(key, records)
+        else:
+            metrics.count('recommendation_cache_hits')
+        return list(records)
 
-        if not recipe_id in self.graph:
+    @metrics.timed('recipes_from_pantry')
+    def recipes_from_pantry(self, ingredients, max_missing: int=None, top_k: int=10):
+        """
+        "What can I cook": the top-k recipes ranked by how much of their ingredient list the pantry covers.
+        Recipes missing the fewest ingredients come first, then the highest share covered, then the best (smoothed) rating.
+        max_missing drops the recipes needing more than that many other ingredients (None: no limit).
+        The covered counts are one bincount over the posting lists of the pantry ingredients (the incidence columns),
+        so only recipes using a pantry ingredient are looked at, and only the levels of missing ingredients needed
+        to fill the top-k are sorted.
+        Returned as hydrate() records where 'shared_ingredients' are the ones from the pantry, 'similarity_score'
+        is the share covered, plus 'missing_ingredients'.
+        """
+        names = {self.canonical_ingredient(ing) for ing in ingredients}
+        pantry = [self.ingredient_index[name] for name in names if name in self.ingredient_index]
+        if not pantry or top_k <= 0:
             return []
 
-        # Get neighbors with their similarity scores
-        neighbors = []
-        for neighbor in self.graph.neighbors(recipe_id):
-            recipe_name = self.id_to_name.get(neighbor, f"Recipe {neighbor}")
-            similarity = self.calculate_similarity_score(normalization_type, neighbor, recipe_id)
-            rating = self.get_avg_recipe_rating(neighbor)
-            ingredients = self.get_recipe_ingredients(neighbor)
-            shared_ingredients = self.get_shared_ingredients(recipe_id, neighbor)
-            instructions = self.get_instructions(neighbor)
-            minutes = self.get_minutes(neighbor)
-            description = self.get_description(neighbor)
-
-            neighbors.append({
-                'id': neighbor,
-                'name': recipe_name,
-                'similarity_score': similarity,
-                'ingredients': ingredients,
-                'shared_ingredients': shared_ingredients,
-                'rating': rating,
-                'instructions': instructions,
-                'minutes': minutes,
-                'description': description
-            })
+        columns = self.ingredient_bitmaps().columns
+        postings = np.concatenate([columns.indices[columns.indptr[i]:columns.indptr[i + 1]] for i in pantry])
+        covered = np.bincount(postings, minlength=columns.shape[0])
+        rows = np.flatnonzero(covered)
+        covered = covered[rows]
+        missing = self.ingredient_set_sizes()[rows] - covered
+        if max_missing is not None:
+            keep = missing <= max_missing
+            rows, covered, missing = rows[keep], covered[keep], missing[keep]
+        metrics.count('pantry_candidates', len(rows))
+        if len(rows) == 0:
+            return []
+
+        # early termination: the fewest missing ingredients whose levels hold top_k recipes, the rest is never sorted
+        last_level = np.searchsorted(np.cumsum(np.bincount(missing)), top_k)
+        keep = missing <= last_level
+        rows, covered, missing = rows[keep], covered[keep], missing[keep]
+        share = covered / (covered + missing)
+        ratings = np.nan_to_num(self.store.smoothed_rating[rows])
+        best = np.lexsort((-ratings, -share, missing))[:top_k]
+
+        records = self.hydrate(zip(self.recipe_order[rows[best]].tolist(), share[best].tolist()))
+        for record in records:
+            record['shared_ingredients'] = [ing for ing in record['ingredients'] if ing in names]
+            record['missing_ingredients'] = [ing for ing in record['ingredients'] if ing not in names]
+        return records
+
+    def profile_search(self, query, top_k: int=10, normalization_type: int=0, output_dir: str="profiles", **constraints):
+        """
+        Opt-in profiling of one search (name lookup + recommendations) under cProfile and tracemalloc.
+        constraints are passed on to recommend_similar_recipes.
+        Returns (recipe_id, suggestions, recommendations, profile paths), see instrumentation.profile_call.
+        """
+        def search():
+            recipe_id, suggestions = self.find_recipe_by_name(query)
+            if recipe_id is None:
+                return recipe_id, suggestions, []
+            return recipe_id, suggestions, self.recommend_similar_recipes(recipe_id, top_k, normalization_type, **constraints)
 
-        # Sort by similarity score and return top-k
-        neighbors.sort(key=lambda x: x['similarity_score'], reverse=True)
-        return neighbors[:top_k]
+        (recipe_id, suggestions, results), paths = profile_call(search, output_dir=output_dir, label="search")
+        return recipe_id, suggestions, results, paths
 
 
 class RecipeRecommender():
@@ -337,7 +1266,7 @@ class RecipeRecommender():
 
         self.norm_type = norm_type
         if norm_type == None:
-            self.norm_type = int(input("How would you like me to evaluate similarity? 0: num of shared ingredients, 1: normalized num of ingredients, 2: top secret special algorithm for best rated similar recipes "))
+            self.norm_type = int(input("How would you like me to evaluate similarity? 0: num of shared ingredients, 1: normalized num of ingredients, 2: top secret special algorithm for best rated similar recipes, 3: rare shared ingredients count more, 4: Jaccard, 5: cosine "))
 
     def command_line_interaction(self, query=None, cur_norm_type=None):
         """
@@ -364,8 +1293,9 @@ class RecipeRecommender():
             print(f"\nIngredients ({len(ingredients)}):")
             print(", ".join(sorted(ingredients)))
 
-            # Get recommendations
-            recommendations = self.graph_manager.recommend_similar_recipes(recipe_id, top_k=self.nr_of_recomms, normalization_type=cur_norm_type)
+            # Get recommendations: rank first, then fetch the details of the kept recipes only
+            ranked = self.graph_manager.score_neighbors(recipe_id, top_k=self.nr_of_recomms, normalization_type=cur_norm_type)
+            recommendations = self.graph_manager.hydrate(ranked, recipe_id)
 
             if recommendations:
                 print(f"\nTop {len(recommendations)} Similar Recipes:")
@@ -391,6 +1321,23 @@ class RecipeRecommender():
         else:
             print(f"❌ No recipes found matching '{query}'")
 
-graph_manager = GraphManager(nrows=5000, debug=False)
-recipe_recommender = RecipeRecommender(graph_manager)
+def build_app_graph_manager():
+    """The GraphManager of the app (from the snapshot when it is fresh)"""
+    return GraphManager.load_or_build(nrows=5000, debug=False, topk_depth=50)
+
+
+_shared = {}
+
+
+def __getattr__(name):
+    """
+    The shared graph_manager / recipe_recommender of the app are built on first access,
+    so importing GraphManager (e.g. in the precompute job) does not load the dataset.
+    """
+    if name not in ('graph_manager', 'recipe_recommender'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if not _shared:
+        _shared['graph_manager'] = build_app_graph_manager()
+        _shared['recipe_recommender'] = RecipeRecommender(_shared['graph_manager'])
+    return _shared[name]
 
@@ -0,0 +1,99 @@
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+# one Python string literal as written by repr(): '...' or "..." without escapes handled by the fast path
+_STRING = r"'[^'\\]*'|\"[^\"\\]*\""
+_ITEM = re.compile(r"'([^'\\]*)'|\"([^\"\\]*)\"")
+_LIST = re.compile(rf"\[\s*(?:(?:{_STRING})\s*(?:,\s*(?:{_STRING})\s*)*,?\s*)?\]")
+
+
+def parse_string_list(text):
+    """
+    Parse a list of strings written as a Python literal, like "['salt', \"mom's sauce\"]".
+    Regular-expression fast path for the plain literals of RAW_recipes.csv, with ast.literal_eval as the fallback
+    for anything else (escape sequences, non string items, malformed input), so the result is the same as literal_eval's.
+    """
+    if isinstance(text, str) and _LIST.fullmatch(text):
+        return [match.group(match.lastindex) for match in _ITEM.finditer(text)]
+    return ast.literal_eval(text)
+
+
+def count_csv_rows(path, chunksize=100_000):
+    """Number of data rows of a CSV, read one column at a time in chunks"""
+    header = pd.read_csv(path, nrows=0).columns[:1].tolist()
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=header, chunksize=chunksize))
+
+
+def sample_csv(path, usecols, n, random_state=42, chunksize=50_000):
+    """
+    Stream a CSV in chunks and keep the rows DataFrame.sample(n=n, random_state=random_state) would pick,
+    in the same order and with the same index, without ever holding the whole file.
+    The sampled positions only depend on the number of rows, so a first pass counts them.
+    """
+    n_rows = count_csv_rows(path)
+    positions = np.random.RandomState(random_state).choice(n_rows, size=n, replace=False)  # what DataFrame.sample draws
+    wanted = np.zeros(n_rows, dtype=bool)
+    wanted[positions] = True
+
+    parts = []
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        parts.append(chunk[wanted[chunk.index.to_numpy()]])
+
+    return pd.concat(parts).loc[positions]
+
+
+def reservoir_sample_csv(path, usecols, n, random_state=42, chunksize=50_000):
+    """
+    Single pass uniform sample of n rows (reservoir sampling, algorithm R) that is deterministic for a random_state.
+    Cheaper than sample_csv because the file is read once, but picks other rows than DataFrame.sample.
+    Rows are returned in file order; at most n rows plus one chunk are held in memory.
+    """
+    rng = np.random.RandomState(random_state)
+    reservoir = np.full(n, -1, dtype=np.int64)  # row position held by each slot
+    parts = []
+    seen = 0
+
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        positions = chunk.index.to_numpy()
+        seen += len(chunk)
+
+        # row i fills slot i while there are free slots, later it replaces a random slot j <= i if j < n
+        slots = positions.copy()
+        late = positions >= n
+        if late.any():
+            slots[late] = rng.randint(0, positions[late] + 1)
+        for slot, position in zip(slots[slots < n].tolist(), positions[slots < n].tolist()):
+            reservoir[slot] = position
+
+        parts = [part[part.index.isin(reservoir)] for part in parts]
+        parts.append(chunk[chunk.index.isin(reservoir)])
+
+    if seen < n:
+        raise ValueError("Cannot take a larger sample than population")
+    return pd.concat(parts).sort_index()
+
+
+def aggregate_ratings(path, chunksize=1_000_000):
+    """
+    Per-recipe rating sums and counts of RAW_interactions.csv, read in chunks with compact dtypes.
+    Each chunk is added into running arrays indexed by recipe_id (ids are dense enough for that),
+    so no interaction rows are kept. Returns (recipe_ids, rating_sums, rating_counts) for the rated recipes, sorted by id.
+    """
+    sums = np.zeros(0, dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+
+    for chunk in pd.read_csv(path, usecols=['recipe_id', 'rating'], dtype={'recipe_id': np.int32, 'rating': np.int8}, chunksize=chunksize):
+        ids = chunk['recipe_id'].to_numpy()
+        if len(ids) == 0:
+            continue
+        size = max(len(sums), int(ids.max()) + 1)
+        sums = np.pad(sums, (0, size - len(sums)))
+        counts = np.pad(counts, (0, size - len(counts)))
+        sums += np.bincount(ids, weights=chunk['rating'].to_numpy(), minlength=size).astype(np.int64)
+        counts += np.bincount(ids, minlength=size)
+
+    rated = np.flatnonzero(counts)
+    return rated.astype(np.int64), sums[rated], counts[rated].astype(np.int32)
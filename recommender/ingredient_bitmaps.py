@@ -0,0 +1,46 @@
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    from recommender.result_cache import LRUCache
+except ImportError:  # imported from inside recommender/
+    from result_cache import LRUCache
+
+
+def pack(mask):
+    """Bool array over the recipe rows -> bitset of 1 bit per row (np.packbits, big-endian bit order)"""
+    return np.packbits(mask)
+
+
+def test(bitset, rows):
+    """Bool array telling for every row in rows whether its bit is set"""
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((bitset[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+class IngredientBitmaps():
+    """
+    One bitset over the recipe rows per ingredient (the rows of the recipes using it), for constrained queries.
+    Bitsets take n_recipes / 8 bytes and are derived from the columns of the incidence matrix (the posting lists of
+    ingredient_to_recipes) the first time an ingredient is asked for; the most recently used ones are kept.
+    """
+
+    def __init__(self, incidence, max_cached: int=4096):
+        self.columns = sp.csc_matrix(incidence)
+        self.n_rows = incidence.shape[0]
+        self.cache = LRUCache(max_cached, ttl=None)
+
+    def bitmap(self, ingredient_id: int):
+        bitset = self.cache.get(ingredient_id)
+        if bitset is None:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[self.columns.indices[self.columns.indptr[ingredient_id]:self.columns.indptr[ingredient_id + 1]]] = True
+            bitset = pack(mask)
+            self.cache.put(ingredient_id, bitset)
+        return bitset
+
+    def everything(self):
+        return pack(np.ones(self.n_rows, dtype=bool))
+
+    def nothing(self):
+        return pack(np.zeros(self.n_rows, dtype=bool))
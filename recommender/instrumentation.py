@@ -0,0 +1,300 @@
+"""
+Timing spans and counters for the hot paths of GraphManager, sent to pluggable sinks.
+
+    from recommender.instrumentation import metrics, HistogramSink, JsonLogSink, PrometheusSink
+
+    histograms = metrics.add_sink(HistogramSink())
+    metrics.add_sink(JsonLogSink())              # one JSON line per span / counter on stderr
+    metrics.add_sink(PrometheusSink()).serve(9108)  # text exposition format on http://localhost:9108/metrics
+
+    with metrics.trace() as trace:               # latency breakdown of one request
+        graph_manager.recommend_similar_recipes(recipe_id)
+    print(trace.breakdown(), trace.counters)
+
+Without sinks and outside of a trace, spans and counters return right away, so the instrumentation is cheap
+when nobody listens. The sinks can also be configured with the RECOMMENDER_METRICS environment variable,
+see configure().
+"""
+import bisect
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the latency buckets in seconds (Prometheus' defaults with a few sub-millisecond buckets)
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+class Trace():
+    """Spans and counters of one request: spans as (name, start, seconds, depth), start relative to the trace start"""
+
+    def __init__(self):
+        self.spans: list[tuple[str, float, float, int]] = []
+        self.counters: dict[str, int] = {}
+        self.depth = 0
+        self.start = time.perf_counter()
+
+    @property
+    def total(self):
+        """Wall time of the outermost spans"""
+        return sum(seconds for _, _, seconds, depth in self.spans if depth == 0)
+
+    def breakdown(self):
+        """Spans in call order (parents before their children) as dicts, for display"""
+        return [{'name': name, 'ms': seconds * 1000, 'depth': depth} for name, _, seconds, depth in sorted(self.spans, key=lambda span: span[1])]
+
+
+class Metrics():
+    """Registry the instrumented code reports to; forwards every span and counter to the sinks"""
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self._local = threading.local()  # active trace of the current thread
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def _active_trace(self):
+        return getattr(self._local, 'trace', None)
+
+    @contextmanager
+    def trace(self):
+        """Collect the spans and counters of the current thread into a Trace until the block ends"""
+        previous = self._active_trace()
+        self._local.trace = Trace()
+        try:
+            yield self._local.trace
+        finally:
+            self._local.trace = previous
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a block under name"""
+        trace = self._active_trace()
+        if not self.sinks and trace is None:
+            yield
+            return
+        if trace is not None:
+            trace.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if trace is not None:
+                trace.depth -= 1
+                trace.spans.append((name, start - trace.start, seconds, trace.depth))
+            for sink in self.sinks:
+                sink.observe(name, seconds)
+
+    def timed(self, name: str):
+        """Decorator form of span()"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.sinks and getattr(self._local, 'trace', None) is None:
+                    return func(*args, **kwargs)  # nobody listens, skip the span
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: int=1):
+        """Add value to the counter name"""
+        trace = self._active_trace()
+        if trace is not None:
+            trace.counters[name] = trace.counters.get(name, 0) + value
+        for sink in self.sinks:
+            sink.count(name, value)
+
+
+class HistogramSink():
+    """In-memory latency histograms (fixed BUCKETS) and counter totals"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: dict[str, list[int]] = {}
+        self.sums: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+
+    def observe(self, name, seconds):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = [0] * len(BUCKETS)
+                self.sums[name] = 0.0
+            self.histograms[name][bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.sums[name] += seconds
+
+    def count(self, name, value):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def percentile(self, name, q):
+        """Upper bound (in seconds) of the bucket holding the q-th percentile of a span, None without data"""
+        buckets = self.histograms.get(name)
+        if not buckets or not sum(buckets):
+            return None
+        rank = q / 100 * sum(buckets)
+        seen = 0
+        for bound, n in zip(BUCKETS, buckets):
+            seen += n
+            if n and seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def summary(self):
+        """{span name: {'count', 'mean_ms', 'p50_ms', 'p99_ms'}} for every observed span"""
+        with self.lock:
+            names = list(self.histograms)
+        result = {}
+        for name in names:
+            n = sum(self.histograms[name])
+            result[name] = {
+                'count': n,
+                'mean_ms': self.sums[name] / n * 1000,
+                'p50_ms': self.percentile(name, 50) * 1000,
+                'p99_ms': self.percentile(name, 99) * 1000
+            }
+        return result
+
+
+class JsonLogSink():
+    """Writes one JSON object per span or counter update to a text stream (stderr by default)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.lock = threading.Lock()
+
+    def _write(self, record):
+        line = json.dumps(record)
+        with self.lock:
+            self.stream.write(line + "\n")
+
+    def observe(self, name, seconds):
+        self._write({'ts': time.time(), 'span': name, 'ms': seconds * 1000})
+
+    def count(self, name, value):
+        self._write({'ts': time.time(), 'counter': name, 'value': value})
+
+
+class PrometheusSink(HistogramSink):
+    """Histograms and counters in the Prometheus text exposition format, optionally served over HTTP"""
+
+    def __init__(self, prefix: str="recommender"):
+        super().__init__()
+        self.prefix = prefix
+        self.server = None
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, buckets in self.histograms.items():
+                metric = f"{self.prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS, buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum {self.sums[name]}")
+                lines.append(f"{metric}_count {cumulative}")
+            for name, value in self.counters.items():
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int=9108, host: str="127.0.0.1"):
+        """
+        Serve render() on http://host:port/metrics from a daemon thread.
+        Only local scrapers can reach it by default; pass host="0.0.0.0" to expose it on all interfaces.
+        """
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+
+def configure(spec: str=None, registry=None):
+    """
+    Add sinks from a comma separated spec, by default the RECOMMENDER_METRICS environment variable:
+    "histogram", "json" and "prometheus[:[host:]port]", e.g. RECOMMENDER_METRICS=json,prometheus:9108
+    (localhost only) or prometheus:0.0.0.0:9108 (all interfaces)
+    Returns the added sinks.
+    """
+    registry = registry or metrics
+    spec = os.environ.get("RECOMMENDER_METRICS", "") if spec is None else spec
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, arg = item.partition(":")
+        if kind == "histogram":
+            sinks.append(HistogramSink())
+        elif kind == "json":
+            sinks.append(JsonLogSink())
+        elif kind == "prometheus":
+            host, _, port = arg.rpartition(":")
+            sinks.append(PrometheusSink().serve(int(port or 9108), host or "127.0.0.1"))
+        else:
+            raise ValueError(f"Unknown metrics sink {kind!r} (expected histogram, json or prometheus[:[host:]port])")
+    for sink in sinks:
+        registry.add_sink(sink)
+    return sinks
+
+
+def profile_call(func, *args, output_dir: str="profiles", label: str="search", top_n: int=25, **kwargs):
+    """
+    Run func(*args, **kwargs) once under cProfile and tracemalloc.
+    Writes <label>-<time>.prof (open with pstats or snakeviz) and <label>-<time>-memory.txt (the top_n allocation
+    sites) into output_dir, and returns (result, {'cpu': prof path, 'memory': txt path, 'peak_bytes': peak}).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.join(output_dir, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+        memory = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    profiler.dump_stats(stem + ".prof")
+    with open(stem + "-memory.txt", "w", encoding="utf-8") as f:
+        f.write(f"peak traced memory: {peak / 1024:.1f} KiB\n")
+        for stat in memory.statistics("lineno")[:top_n]:
+            f.write(f"{stat}\n")
+    return result, {'cpu': stem + ".prof", 'memory': stem + "-memory.txt", 'peak_bytes': peak}
+
+
+metrics = Metrics()  # process-wide registry used by GraphManager
@@ -0,0 +1,153 @@
+import bisect
+import heapq
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+
+CHAR_BUCKETS = 64
+
+
+def char_histograms(names):
+    """Per-name character counts folded into CHAR_BUCKETS buckets, as an (n_names x CHAR_BUCKETS) array"""
+    lengths = np.array([len(name) for name in names], dtype=np.int64)
+    codes = np.frombuffer("".join(names).encode("utf-32-le"), dtype=np.uint32) % CHAR_BUCKETS
+    owner = np.repeat(np.arange(len(names)), lengths)
+    counts = np.bincount(owner * CHAR_BUCKETS + codes, minlength=len(names) * CHAR_BUCKETS)
+    return np.minimum(counts, 255).astype(np.uint8).reshape(len(names), CHAR_BUCKETS)
+
+
+def trigrams(text: str):
+    """Character trigrams of a lowercase name, padded so that word starts and ends count as well"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    """
+    Recipe name lookup built once at load time:
+    - exact lookup by lowercase name
+    - fuzzy suggestions: a character-trigram inverted index prunes the names to the candidates sharing
+      the most trigrams with the query, a vectorized upper bound of difflib's ratio (shared characters, like
+      quick_ratio) drops and orders them, and they are re-scored with difflib's ratio until no remaining
+      candidate can enter the top n (same scores, cutoff and ordering as difflib.get_close_matches)
+    - prefix / autocomplete queries by binary search over the sorted names
+    Names can be added and removed in place (removed names are tombstoned, not deleted from the postings).
+    """
+
+    def __init__(self, name_to_id: dict[str, int], max_candidates: int=1000):
+        self.name_to_id = name_to_id
+        self.names: list[str] = []
+        self.position: dict[str, int] = {}  # {name: index in names}
+        self.sorted_names: list[str] = []
+        self.max_candidates = max_candidates  # names kept by the trigram pruning per fuzzy query
+        self.postings: dict[str, np.ndarray] = {}
+        self.trigram_counts = np.zeros(0, dtype=np.int32)
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.char_counts = np.zeros((0, CHAR_BUCKETS), dtype=np.uint8)
+        self.alive = np.zeros(0, dtype=bool)
+        self._index_names(list(name_to_id))
+
+    def _index_names(self, names):
+        first = len(self.names)
+        self.names.extend(names)
+        self.position.update((name, i) for i, name in enumerate(names, start=first))
+        self.sorted_names = sorted(self.sorted_names + names)
+
+        postings = defaultdict(list)
+        for i, name in enumerate(names, start=first):
+            for gram in trigrams(name):
+                postings[gram].append(i)
+        for gram, ids in postings.items():
+            new_ids = np.array(ids, dtype=np.int32)
+            self.postings[gram] = np.concatenate([self.postings[gram], new_ids]) if gram in self.postings else new_ids
+
+        self.trigram_counts = np.concatenate([self.trigram_counts, np.array([len(trigrams(name)) for name in names], dtype=np.int32)])
+        self.lengths = np.concatenate([self.lengths, np.array([len(name) for name in names], dtype=np.int32)])
+        self.char_counts = np.vstack([self.char_counts, char_histograms(names)])
+        self.alive = np.concatenate([self.alive, np.ones(len(names), dtype=bool)])
+
+    def add(self, names_to_ids: dict[str, int]):
+        """Index a batch of new (lowercase) names; names already indexed only get their recipe id updated"""
+        self.name_to_id.update(names_to_ids)
+        new_names = []
+        for name in names_to_ids:
+            i = self.position.get(name)
+            if i is None:
+                new_names.append(name)
+            elif not self.alive[i]:
+                self.alive[i] = True
+                bisect.insort(self.sorted_names, name)
+        if new_names:
+            self._index_names(new_names)
+
+    def remove(self, name: str):
+        """Stop returning a name from every lookup"""
+        self.name_to_id.pop(name, None)
+        i = self.position.get(name)
+        if i is not None and self.alive[i]:
+            self.alive[i] = False
+            del self.sorted_names[bisect.bisect_left(self.sorted_names, name)]
+
+    def __len__(self):
+        return len(self.sorted_names)
+
+    def exact(self, query: str):
+        """Recipe id of an exact (lowercase) name match, or None"""
+        return self.name_to_id.get(query)
+
+    def candidates(self, query: str):
+        """Indices of the names sharing the most trigrams with the query (by Dice coefficient)"""
+        grams = trigrams(query)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        shared[~self.alive] = 0
+        matched = np.flatnonzero(shared)
+        dice = 2.0 * shared[matched] / (len(grams) + self.trigram_counts[matched])
+        if len(matched) > self.max_candidates:
+            matched = matched[np.argpartition(-dice, self.max_candidates)[:self.max_candidates]]
+        return matched
+
+    def suggest(self, query: str, n: int=5, cutoff: float=0.6):
+        """Up to n names close to the query, best first, like difflib.get_close_matches on the candidates only"""
+        candidates = self.candidates(query)
+        if len(candidates) == 0 or not query:
+            return []
+
+        # upper bound of SequenceMatcher.ratio(): 2 * shared characters / total length
+        query_counts = char_histograms([query])[0]
+        shared = np.minimum(self.char_counts[candidates], query_counts).sum(axis=1)
+        bound = 2.0 * shared / (self.lengths[candidates] + len(query))
+        keep = bound >= cutoff
+        order = np.argsort(-bound[keep], kind='stable')
+        candidates, bound = candidates[keep][order], bound[keep][order]
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        best = []  # min-heap of the n best (score, name)
+        for i, upper in zip(candidates.tolist(), bound.tolist()):
+            if len(best) == n and upper < best[0][0]:
+                break  # no remaining candidate can beat the current top n
+            name = self.names[i]
+            matcher.set_seq1(name)
+            score = matcher.ratio()
+            if score >= cutoff:
+                if len(best) < n:
+                    heapq.heappush(best, (score, name))
+                else:
+                    heapq.heappushpop(best, (score, name))
+        return [name for _, name in sorted(best, reverse=True)]
+
+    def complete(self, prefix: str, n: int=10):
+        """Up to n names starting with prefix, in alphabetical order"""
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        matches = []
+        for name in self.sorted_names[start:start + n]:
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
@@ -0,0 +1,116 @@
+"""
+Offline job: recommendations for every recipe of the catalog, streamed to a JSONL or Parquet file.
+
+    python -m recommender.precompute --output recommendations.jsonl --top-k 10 --norm 0 1 2 --workers 4
+
+The graph is loaded from (or built into) the snapshot once; every worker process memory-maps that snapshot
+and scores its batches with GraphManager.recommend_batch.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from recommender.graph_manager import GraphManager
+
+_worker_manager: GraphManager = None
+
+
+def _init_worker(snapshot_path, topk_depth):
+    global _worker_manager
+    _worker_manager = GraphManager.load(snapshot_path, topk_depth=topk_depth)  # memory-maps the top-k index written by the main process
+
+
+def _score_batch(task):
+    recipe_ids, top_k, normalization_types = task
+    rows = []
+    for norm in normalization_types:
+        for recipe_id, ranked in zip(recipe_ids, _worker_manager.recommend_batch(recipe_ids, top_k, norm)):
+            rows.append({
+                'recipe_id': recipe_id,
+                'normalization_type': norm,
+                'recommendations': [{'id': neighbor, 'score': score} for neighbor, score in ranked]
+            })
+    return len(recipe_ids), rows
+
+
+class JsonlWriter():
+
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter():
+    """Writes one row group per batch; needs pyarrow"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow (pip install pyarrow), or use a .jsonl output")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('recipe_id', pa.int64()),
+            ('normalization_type', pa.int8()),
+            ('recommendations', pa.list_(pa.struct([('id', pa.int64()), ('score', pa.float64())])))
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if rows:
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute recommendations for every recipe")
+    parser.add_argument("--output", required=True, help="output file, .jsonl or .parquet")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--norm", type=int, nargs="+", default=[0, 1, 2], help="normalization types")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=1000, help="recipes per task")
+    parser.add_argument("--data-path", default="archive/")
+    parser.add_argument("--nrows", type=int, default=5000)
+    parser.add_argument("--snapshot", default=None, help="snapshot directory (default: <data-path>/snapshot)")
+    parser.add_argument("--topk-depth", type=int, default=0, help="build a top-k index of this depth in every worker")
+    args = parser.parse_args(argv)
+
+    snapshot_path = args.snapshot or os.path.join(args.data_path, "snapshot")
+    graph_manager = GraphManager.load_or_build(snapshot_path, nrows=args.nrows, data_path=args.data_path, topk_depth=args.topk_depth)  # fresh snapshot and top-k index for the workers
+    recipe_ids = graph_manager.recipe_order.tolist()
+    del graph_manager
+
+    writer = ParquetWriter(args.output) if args.output.endswith(".parquet") else JsonlWriter(args.output)
+    tasks = [(recipe_ids[i:i + args.batch_size], args.top_k, args.norm) for i in range(0, len(recipe_ids), args.batch_size)]
+    total_queries = len(recipe_ids) * len(args.norm)
+
+    start = time.perf_counter()
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(snapshot_path, args.topk_depth)) as pool:
+            for n_recipes, rows in pool.map(_score_batch, tasks):
+                writer.write(rows)
+                done += n_recipes * len(args.norm)
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{total_queries} queries, {done / elapsed:,.0f} queries/s", end="", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nWrote {total_queries} recommendation lists to {args.output} in {elapsed:.1f}s ({total_queries / elapsed:,.0f} queries/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
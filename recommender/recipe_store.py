@@ -0,0 +1,303 @@
+import sys
+
+import numpy as np
+
+try:
+    from recommender import snapshot
+except ImportError:  # imported from inside recommender/ (e.g. statistics.ipynb)
+    import snapshot
+
+STEP_SEPARATOR = "\x1e"  # record separator, never part of a step
+
+
+class RecipeStore():
+    """
+    Columnar storage of the per-recipe data, addressed by dense row indices.
+    - ingredients are interned: vocabulary[i] is the name of ingredient id i, and the ingredient ids of row r
+      are ingredient_values[ingredient_offsets[r]:ingredient_offsets[r + 1]] (a ragged list, original order kept)
+    - minutes, ratings (mean, sum, count and Bayesian-smoothed mean) are NumPy arrays
+    - steps and descriptions are utf-8 blobs with offsets and are only decoded when asked for
+    All arrays can be memory-mapped straight from a snapshot.
+    """
+
+    def __init__(self, recipe_ids, vocabulary, ingredient_offsets, ingredient_values, minutes,
+                 step_offsets, step_blob, description_offsets, description_blob,
+                 rating=None, rating_count=None, rating_sum=None, smoothed_rating=None, rating_prior=None):
+        self.recipe_ids: np.ndarray = recipe_ids
+        self.row_of: dict[int, int] = {rid: row for row, rid in enumerate(recipe_ids.tolist())}
+        self.vocabulary: list[str] = vocabulary
+        self.ingredient_index: dict[str, int] = {ing: i for i, ing in enumerate(vocabulary)}
+        self.ingredient_offsets: np.ndarray = ingredient_offsets
+        self.ingredient_values: np.ndarray = ingredient_values
+        self.minutes: np.ndarray = minutes
+        self.step_offsets: np.ndarray = step_offsets
+        self.step_blob: np.ndarray = step_blob
+        self.description_offsets: np.ndarray = description_offsets
+        self.description_blob: np.ndarray = description_blob
+        self.rating: np.ndarray = rating if rating is not None else np.full(len(recipe_ids), np.nan)  # NaN = not rated
+        self.rating_count: np.ndarray = rating_count if rating_count is not None else np.zeros(len(recipe_ids), dtype=np.int32)
+        self.rating_sum: np.ndarray = rating_sum if rating_sum is not None else np.zeros(len(recipe_ids), dtype=np.int64)
+        self.smoothed_rating: np.ndarray = smoothed_rating if smoothed_rating is not None else np.full(len(recipe_ids), np.nan)  # Bayesian mean
+        self.rating_prior: np.ndarray = rating_prior if rating_prior is not None else np.zeros(2)  # [prior mean, prior weight]
+
+    @classmethod
+    def from_lists(cls, recipe_ids, ingredient_lists, minutes, steps, descriptions):
+        """Build a store from per-recipe Python values (all in the same row order)"""
+        ingredient_index = {}
+        interned = [[ingredient_index.setdefault(ing, len(ingredient_index)) for ing in ingredients] for ingredients in ingredient_lists]
+        ingredient_offsets, ingredient_values = snapshot.pack_ragged(interned)
+        step_offsets, step_blob = snapshot.pack_strings([STEP_SEPARATOR.join(recipe_steps) for recipe_steps in steps])
+        description_offsets, description_blob = snapshot.pack_strings(descriptions)
+
+        return cls(
+            np.asarray(recipe_ids, dtype=np.int64),
+            list(ingredient_index),
+            ingredient_offsets,
+            ingredient_values,
+            np.asarray(minutes, dtype=np.int32),
+            step_offsets, step_blob,
+            description_offsets, description_blob
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Inverse of to_arrays(), the arrays are used as they are (possibly memory-mapped)"""
+        return cls(
+            arrays['recipe_ids'],
+            snapshot.unpack_strings(arrays['vocabulary_offsets'], arrays['vocabulary_blob']),
+            arrays['ingredient_offsets'],
+            arrays['ingredient_values'],
+            arrays['minutes'],
+            arrays['step_offsets'], arrays['step_blob'],
+            arrays['description_offsets'], arrays['description_blob'],
+            arrays['rating'], arrays['rating_count'], arrays['rating_sum'], arrays['smoothed_rating'], arrays['rating_prior']
+        )
+
+    def to_arrays(self):
+        vocabulary_offsets, vocabulary_blob = snapshot.pack_strings(self.vocabulary)
+        return {
+            'recipe_ids': self.recipe_ids,
+            'vocabulary_offsets': vocabulary_offsets,
+            'vocabulary_blob': vocabulary_blob,
+            'ingredient_offsets': self.ingredient_offsets,
+            'ingredient_values': self.ingredient_values,
+            'minutes': self.minutes,
+            'step_offsets': self.step_offsets,
+            'step_blob': self.step_blob,
+            'description_offsets': self.description_offsets,
+            'description_blob': self.description_blob,
+            'rating': self.rating,
+            'rating_count': self.rating_count,
+            'rating_sum': self.rating_sum,
+            'smoothed_rating': self.smoothed_rating,
+            'rating_prior': self.rating_prior
+        }
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def ingredient_ids(self, row: int):
+        return self.ingredient_values[self.ingredient_offsets[row]:self.ingredient_offsets[row + 1]]
+
+    def ingredients(self, row: int):
+        return [self.vocabulary[i] for i in self.ingredient_ids(row).tolist()]
+
+    def ingredient_counts(self):
+        """Number of listed ingredients per row"""
+        return np.diff(self.ingredient_offsets)
+
+    def steps(self, row: int):
+        text = snapshot.unpack_string(self.step_offsets, self.step_blob, row)
+        return text.split(STEP_SEPARATOR) if text else []
+
+    def description(self, row: int):
+        return snapshot.unpack_string(self.description_offsets, self.description_blob, row)
+
+    def set_ratings(self, rating_sum, rating_count, prior_mean: float, prior_weight: float):
+        """
+        Set the ratings from per-row sums and counts.
+        rating is the plain mean (NaN without ratings), smoothed_rating the Bayesian mean
+        (prior_weight * prior_mean + sum) / (prior_weight + count), which pulls recipes with few ratings towards prior_mean.
+        """
+        self.rating_sum = np.asarray(rating_sum, dtype=np.int64)
+        self.rating_count = np.asarray(rating_count, dtype=np.int32)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.rating = np.where(self.rating_count > 0, self.rating_sum / self.rating_count, np.nan)
+        self.smoothed_rating = (prior_weight * prior_mean + self.rating_sum) / (prior_weight + self.rating_count)
+        self.rating_prior = np.array([prior_mean, prior_weight], dtype=np.float64)
+
+    def add_ratings(self, rows, ratings):
+        """
+        Add individual ratings (rows[i] got ratings[i]) and update the mean and smoothed mean of those rows only.
+        The prior mean stays the one of the last full load. Ratings are whole stars like in RAW_interactions.csv
+        (the sums are integers); anything else raises ValueError before a rating is added.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(ratings, dtype=np.float64)
+        if not np.all(np.isfinite(values) & (values == np.round(values))):
+            raise ValueError(f"Ratings must be whole numbers, got {values[~(np.isfinite(values) & (values == np.round(values)))][:5].tolist()}")
+        ratings = values.astype(np.int64)
+        self.rating_sum = np.array(self.rating_sum)  # copies, memory-mapped arrays are read-only
+        self.rating_count = np.array(self.rating_count)
+        self.rating = np.array(self.rating)
+        self.smoothed_rating = np.array(self.smoothed_rating)
+
+        np.add.at(self.rating_sum, rows, ratings)
+        np.add.at(self.rating_count, rows, 1)
+        touched = np.unique(rows)
+        prior_mean, prior_weight = self.rating_prior
+        self.rating[touched] = self.rating_sum[touched] / self.rating_count[touched]
+        self.smoothed_rating[touched] = (prior_weight * prior_mean + self.rating_sum[touched]) / (prior_weight + self.rating_count[touched])
+
+    def append(self, recipe_ids, ingredient_lists, minutes, steps, descriptions):
+        """
+        Add recipes as new rows at the end of the store; new ingredients are added to the vocabulary.
+        The columns are concatenated once per call, so add recipes in batches.
+        """
+        first_row = len(self.recipe_ids)
+        step_offsets, step_blob = snapshot.pack_strings([STEP_SEPARATOR.join(recipe_steps) for recipe_steps in steps])
+        description_offsets, description_blob = snapshot.pack_strings(descriptions)
+        # the vocabulary grows last, once nothing can fail anymore
+        interned = [[self.ingredient_index.setdefault(ing, len(self.ingredient_index)) for ing in ingredients] for ingredients in ingredient_lists]
+        self.vocabulary = list(self.ingredient_index)
+        ingredient_offsets, ingredient_values = snapshot.pack_ragged(interned)
+        n_new = len(interned)
+        prior_mean = self.rating_prior[0]
+
+        self.recipe_ids = np.concatenate([self.recipe_ids, np.asarray(recipe_ids, dtype=np.int64)])
+        self.ingredient_offsets = np.concatenate([self.ingredient_offsets, ingredient_offsets[1:] + self.ingredient_offsets[-1]])
+        self.ingredient_values = np.concatenate([self.ingredient_values, ingredient_values])
+        self.minutes = np.concatenate([self.minutes, np.asarray(minutes, dtype=np.int32)])
+        self.step_offsets = np.concatenate([self.step_offsets, step_offsets[1:] + self.step_offsets[-1]])
+        self.step_blob = np.concatenate([self.step_blob, step_blob])
+        self.description_offsets = np.concatenate([self.description_offsets, description_offsets[1:] + self.description_offsets[-1]])
+        self.description_blob = np.concatenate([self.description_blob, description_blob])
+        self.rating = np.concatenate([self.rating, np.full(n_new, np.nan)])
+        self.rating_count = np.concatenate([self.rating_count, np.zeros(n_new, dtype=np.int32)])
+        self.rating_sum = np.concatenate([self.rating_sum, np.zeros(n_new, dtype=np.int64)])
+        self.smoothed_rating = np.concatenate([self.smoothed_rating, np.full(n_new, prior_mean)])
+
+        for row, rid in enumerate(np.asarray(recipe_ids).tolist(), start=first_row):
+            self.row_of[rid] = row
+
+    def delete(self, row: int):
+        """Remove one row in place: its slice is cut out of every column and the rows after it move up by one"""
+        def delete_ragged(offsets, values):
+            start, end = offsets[row], offsets[row + 1]
+            return (np.concatenate([offsets[:row + 1], offsets[row + 2:] - (end - start)]),
+                    np.concatenate([values[:start], values[end:]]))
+
+        for rid in self.recipe_ids[row + 1:].tolist():
+            self.row_of[rid] -= 1
+        del self.row_of[int(self.recipe_ids[row])]
+        self.recipe_ids = np.delete(self.recipe_ids, row)
+        self.ingredient_offsets, self.ingredient_values = delete_ragged(self.ingredient_offsets, self.ingredient_values)
+        self.step_offsets, self.step_blob = delete_ragged(self.step_offsets, self.step_blob)
+        self.description_offsets, self.description_blob = delete_ragged(self.description_offsets, self.description_blob)
+        self.minutes = np.delete(self.minutes, row)
+        self.rating = np.delete(self.rating, row)
+        self.rating_count = np.delete(self.rating_count, row)
+        self.rating_sum = np.delete(self.rating_sum, row)
+        self.smoothed_rating = np.delete(self.smoothed_rating, row)
+
+    def select(self, rows):
+        """New store with only the given rows (in that order), sharing the vocabulary"""
+        rows = np.asarray(rows, dtype=np.int64)
+
+        def take_ragged(offsets, values):
+            lengths = np.diff(offsets)[rows]
+            new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=new_offsets[1:])
+            # index of every kept value: start of its row + position inside the row
+            starts = np.repeat(np.asarray(offsets)[rows] - new_offsets[:-1], lengths)
+            return new_offsets, np.asarray(values)[starts + np.arange(new_offsets[-1])]
+
+        ingredient_offsets, ingredient_values = take_ragged(self.ingredient_offsets, self.ingredient_values)
+        step_offsets, step_blob = take_ragged(self.step_offsets, self.step_blob)
+        description_offsets, description_blob = take_ragged(self.description_offsets, self.description_blob)
+        return RecipeStore(
+            np.asarray(self.recipe_ids)[rows], self.vocabulary, ingredient_offsets, ingredient_values, np.asarray(self.minutes)[rows],
+            step_offsets, step_blob, description_offsets, description_blob,
+            np.asarray(self.rating)[rows], np.asarray(self.rating_count)[rows], np.asarray(self.rating_sum)[rows],
+            np.asarray(self.smoothed_rating)[rows], np.array(self.rating_prior)
+        )
+
+    def nbytes(self):
+        """Memory held by the store: array buffers plus the vocabulary and the id -> row map"""
+        arrays = [self.recipe_ids, self.ingredient_offsets, self.ingredient_values, self.minutes, self.step_offsets, self.step_blob,
+                  self.description_offsets, self.description_blob, self.rating, self.rating_count, self.rating_sum, self.smoothed_rating,
+                  self.rating_prior]
+        return sum(a.nbytes for a in arrays) + deep_sizeof(self.vocabulary) + deep_sizeof(self.ingredient_index) + deep_sizeof(self.row_of)
+
+
+def deep_sizeof(obj, seen=None):
+    """sys.getsizeof including the contents of dicts, lists, tuples and sets (shared objects counted once)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif isinstance(obj, np.ndarray):
+        size = obj.nbytes
+    return size
+
+
+def memory_report(store: RecipeStore):
+    """
+    Compare the memory of the store with the per-field dicts GraphManager used before
+    (recipe_ingredients, recipe_minutes, recipe_instructions, recipe_descriptions, id_to_rating, id_to_rating_count).
+    The dict layout is rebuilt from the store for the measurement. Returns {field: (dict bytes, store bytes)}.
+    """
+    ids = store.recipe_ids.tolist()
+    rated = ~np.isnan(store.rating)
+    rated_ids = store.recipe_ids[rated].tolist()
+
+    dict_layout = {
+        # every occurrence of an ingredient used to be its own string object
+        'ingredients': {rid: [str(ing.encode(), 'utf-8') for ing in store.ingredients(row)] for row, rid in enumerate(ids)},
+        'minutes': dict(zip(ids, store.minutes.tolist())),
+        'instructions': {rid: store.steps(row) for row, rid in enumerate(ids)},
+        'descriptions': {rid: store.description(row) for row, rid in enumerate(ids)},
+        'rating': dict(zip(rated_ids, store.rating[rated].tolist())),
+        'rating_count': dict(zip(rated_ids, store.rating_count[rated].tolist()))
+    }
+    store_layout = {
+        'ingredients': store.ingredient_offsets.nbytes + store.ingredient_values.nbytes + deep_sizeof(store.vocabulary) + deep_sizeof(store.ingredient_index),
+        'minutes': store.minutes.nbytes,
+        'instructions': store.step_offsets.nbytes + store.step_blob.nbytes,
+        'descriptions': store.description_offsets.nbytes + store.description_blob.nbytes,
+        'rating': store.rating.nbytes,
+        'rating_count': store.rating_count.nbytes
+    }
+
+    report = {field: (deep_sizeof(values), store_layout[field]) for field, values in dict_layout.items()}
+    report['id -> row map'] = (0, deep_sizeof(store.row_of) + store.recipe_ids.nbytes)
+    return report
+
+
+def format_memory_report(report):
+    lines = [f"{'field':<16}{'dicts (MB)':>14}{'store (MB)':>14}"]
+    for field, (dict_bytes, store_bytes) in report.items():
+        lines.append(f"{field:<16}{dict_bytes / 1e6:>14.2f}{store_bytes / 1e6:>14.2f}")
+    dict_total = sum(d for d, _ in report.values())
+    store_total = sum(s for _, s in report.values())
+    lines.append(f"{'total':<16}{dict_total / 1e6:>14.2f}{store_total / 1e6:>14.2f}")
+    lines.append(f"The store uses {store_total / dict_total:.1%} of the dict layout" if dict_total else "")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    # python -m recommender.recipe_store [snapshot directory]
+    path = sys.argv[1] if len(sys.argv) > 1 else "archive/snapshot"
+    meta = snapshot.read_meta(path)
+    if meta is None:
+        sys.exit(f"No snapshot found at {path}, start the app once to create it")
+    store = RecipeStore.from_arrays(snapshot.read_arrays(path, meta, mmap=False))
+    print(f"Memory of {len(store)} recipes")
+    print(format_memory_report(memory_report(store)))
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache():
+    """
+    Bounded, thread safe mapping with least-recently-used eviction and a time to live per entry.
+    Used to memoize recommendation lists per (recipe_id, normalization_type, top_k): Streamlit reruns the whole
+    script on every interaction, so the same lists are asked for again and again.
+    """
+
+    def __init__(self, maxsize: int=1024, ttl: float=600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds an entry stays valid, None for no expiry
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()  # {key: (expires_at, value)}, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= self.clock()):
+                if entry is not None:
+                    del self.entries[key]  # expired
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and (entry[0] is None or entry[0] > self.clock())
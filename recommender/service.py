@@ -0,0 +1,307 @@
+"""
+HTTP JSON service in front of one shared, read-only GraphManager, on plain asyncio (no web framework needed).
+
+    python -m recommender.service --port 8080 --workers 4
+
+    GET /search?q=chicken curry&n=5       exact match or fuzzy suggestions
+    GET /recommend/{id}?k=10&norm=1       same records as GraphManager.recommend_similar_recipes
+    GET /recipe/{id}                      ingredients, steps, minutes, description and ratings
+    GET /health
+
+Concurrent /recommend calls are micro-batched: requests arriving within --max-delay-ms of each other (up to
+--max-batch) are scored together with GraphManager.recommend_batch. Scoring, hydration and fuzzy search run in a
+thread pool (or a process pool with --executor process, every worker loading the snapshot), never on the event loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from recommender.graph_manager import GraphManager
+from recommender.instrumentation import metrics
+
+MAX_TOP_K = 100
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024  # request bodies are read and discarded
+
+_manager: GraphManager = None  # the GraphManager of this process (main process for threads, each worker for processes)
+
+
+def _init_worker(snapshot_path, topk_depth):
+    global _manager
+    _manager = GraphManager.load(snapshot_path, topk_depth=topk_depth)  # memory-maps the top-k index written by the main process
+
+
+def _recommend(recipe_ids, top_k, normalization_type):
+    """Records of the top_k neighbors of every recipe; the ones not in the recommendation cache are scored in one batch"""
+    cache = _manager.recommendation_cache
+    results = [cache.get((recipe_id, normalization_type, top_k)) for recipe_id in recipe_ids]
+    missing = [i for i, records in enumerate(results) if records is None]
+    if missing:
+        ranked = _manager.recommend_batch([recipe_ids[i] for i in missing], top_k, normalization_type)
+        for i, neighbors in zip(missing, ranked):
+            results[i] = _manager.hydrate(neighbors, recipe_ids[i])
+            cache.put((recipe_ids[i], normalization_type, top_k), results[i])
+    return results
+
+
+def _search(query, n):
+    recipe_id, suggestions = _manager.find_recipe_by_name(query, max_suggestions=n)
+    if recipe_id is None:
+        return {'query': query, 'recipe_id': None, 'name': None, 'suggestions': suggestions}
+    return {'query': query, 'recipe_id': recipe_id, 'name': _manager.id_to_name[recipe_id], 'suggestions': []}
+
+
+def _recipe(recipe_id):
+    if recipe_id not in _manager.recipe_row:
+        return None
+    return {
+        'id': recipe_id,
+        'name': _manager.id_to_name[recipe_id],
+        'ingredients': _manager.get_recipe_ingredients(recipe_id),
+        'minutes': _manager.get_minutes(recipe_id),
+        'instructions': _manager.get_instructions(recipe_id),
+        'description': _manager.get_description(recipe_id),
+        'rating': _manager.get_avg_recipe_rating(recipe_id),
+        'smoothed_rating': _manager.get_smoothed_recipe_rating(recipe_id),
+        'rating_count': _manager.get_rating_count(recipe_id)
+    }
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher():
+    """
+    Collects concurrent recommend calls per normalization type and runs them as one batch in the executor,
+    when max_batch calls are waiting or max_delay seconds after the first one arrived.
+    The batch is scored with the largest top_k asked for and every caller gets its own prefix.
+    """
+
+    def __init__(self, executor, max_batch: int=64, max_delay: float=0.002):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending: dict[int, list] = {}  # {normalization_type: [(recipe_id, top_k, future), ...]}
+        self.timers: dict[int, asyncio.TimerHandle] = {}
+
+    async def recommend(self, recipe_id: int, top_k: int, normalization_type: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiting = self.pending.setdefault(normalization_type, [])
+        waiting.append((recipe_id, top_k, future))
+        if len(waiting) >= self.max_batch:
+            self._flush(normalization_type)
+        elif normalization_type not in self.timers:
+            self.timers[normalization_type] = loop.call_later(self.max_delay, self._flush, normalization_type)
+        return await future
+
+    def _flush(self, normalization_type):
+        timer = self.timers.pop(normalization_type, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(normalization_type, [])
+        if not batch:
+            return
+
+        metrics.count('service_batches')
+        metrics.count('service_batched_requests', len(batch))
+        recipe_ids = list(dict.fromkeys(recipe_id for recipe_id, _, _ in batch))
+        top_k = max(k for _, k, _ in batch)
+        scored = asyncio.get_running_loop().run_in_executor(self.executor, _recommend, recipe_ids, top_k, normalization_type)
+
+        def deliver(done):
+            if done.exception() is not None:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(done.exception())
+                return
+            by_id = dict(zip(recipe_ids, done.result()))
+            for recipe_id, k, future in batch:
+                if not future.done():
+                    future.set_result(by_id[recipe_id][:k])
+
+        scored.add_done_callback(deliver)
+
+
+class RecommendationService():
+    """Routes the requests of the HTTP server to the batcher and the executor"""
+
+    def __init__(self, recipe_ids, executor, max_batch: int=64, max_delay: float=0.002):
+        self.recipe_ids = recipe_ids  # ids served, checked on the event loop before any work is queued
+        self.executor = executor
+        self.batcher = MicroBatcher(executor, max_batch, max_delay)
+
+    async def handle(self, path: str, query: dict):
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        match parts:
+            case ["health"]:
+                return {'status': 'ok', 'recipes': len(self.recipe_ids)}
+            case ["search"]:
+                q = query.get('q', [''])[0].strip()
+                if not q:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "missing query parameter q")
+                n = self._int_param(query, 'n', 5, 1, 50)
+                return await self._offload(_search, q, n)
+            case ["recommend", recipe_id]:
+                recipe_id = self._recipe_id(recipe_id)
+                top_k = self._int_param(query, 'k', 10, 1, MAX_TOP_K)
+                norm = self._int_param(query, 'norm', 0, 0, max(GraphManager.NORMALIZATION_TYPES))
+                records = await self.batcher.recommend(recipe_id, top_k, norm)
+                return {'recipe_id': recipe_id, 'normalization_type': norm, 'top_k': top_k, 'recommendations': records}
+            case ["recipe", recipe_id]:
+                return await self._offload(_recipe, self._recipe_id(recipe_id))
+            case _:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for /{path.strip('/')}")
+
+    async def _offload(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _recipe_id(self, text):
+        try:
+            recipe_id = int(text)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid recipe id {text!r}")
+        if recipe_id not in self.recipe_ids:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown recipe {recipe_id}")
+        return recipe_id
+
+    @staticmethod
+    def _int_param(query, name, default, low, high):
+        text = query.get(name, [None])[0]
+        if text is None:
+            return default
+        try:
+            value = int(text)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+        if not low <= value <= high:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be between {low} and {high}")
+        return value
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Minimal HTTP/1.1: GET requests, keep-alive unless the client asks to close"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {'error': "headers too large"}, False)
+                    return
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': "malformed request line"}, False)
+                    return
+                content_length = headers.get('content-length', '0') or '0'
+                if not (content_length.isascii() and content_length.isdigit()):
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': "invalid Content-Length"}, False)
+                    return
+                if int(content_length) > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': f"bodies are limited to {MAX_BODY_BYTES} bytes"}, False)
+                    return
+                if int(content_length):
+                    try:
+                        await reader.readexactly(int(content_length))  # bodies are not used
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        return
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == "HTTP/1.1"
+
+                if method != "GET":
+                    status, body = HTTPStatus.METHOD_NOT_ALLOWED, {'error': "only GET is supported"}
+                else:
+                    url = urlsplit(target)
+                    try:
+                        with metrics.span('service_request'):
+                            status, body = HTTPStatus.OK, await self.handle(url.path, parse_qs(url.query))
+                        if body is None:
+                            status, body = HTTPStatus.NOT_FOUND, {'error': "not found"}
+                    except HTTPError as error:
+                        status, body = error.status, {'error': str(error)}
+                    except Exception as error:  # keep serving the other requests
+                        status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(error).__name__}: {error}"}
+                await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status: HTTPStatus, body, keep_alive: bool):
+        payload = json.dumps(body, default=_json_default).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+
+
+def _json_default(value):
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def serve(service: RecommendationService, host: str, port: int):
+    server = await asyncio.start_server(service.serve_connection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"Serving recommendations on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    global _manager
+    parser = argparse.ArgumentParser(description="HTTP JSON recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-path", default="archive/")
+    parser.add_argument("--nrows", type=int, default=5000)
+    parser.add_argument("--snapshot", default=None, help="snapshot directory (default: <data-path>/snapshot)")
+    parser.add_argument("--topk-depth", type=int, default=50)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-batch", type=int, default=64, help="recommend calls scored together at most")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="how long the first call of a batch waits for others")
+    args = parser.parse_args(argv)
+
+    snapshot_path = args.snapshot or os.path.join(args.data_path, "snapshot")
+    _manager = GraphManager.load_or_build(snapshot_path, nrows=args.nrows, data_path=args.data_path, topk_depth=args.topk_depth)
+    recipe_ids = set(_manager.recipe_order.tolist())
+
+    if args.executor == "process":
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(snapshot_path, args.topk_depth))
+        for future in [executor.submit(_recommend, [], 1, 0) for _ in range(args.workers)]:
+            future.result()  # start the workers (and load their snapshots) before the first request
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="recommend")
+
+    service = RecommendationService(recipe_ids, executor, args.max_batch, args.max_delay_ms / 1000)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+SNAPSHOT_VERSION = 4
+META_FILE = "meta.json"
+
+
+def file_digest(path, block_size=1 << 20):
+    """blake2b hash of a file's content, read in 1MB blocks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_sources(paths):
+    """Size, mtime and content hash of every source file, used to detect stale snapshots"""
+    sources = {}
+    for path in paths:
+        stat = os.stat(path)
+        sources[os.path.basename(path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "digest": file_digest(path)
+        }
+    return sources
+
+
+def sources_match(recorded, paths, refreshed=None):
+    """
+    Check the recorded source description against the files on disk.
+    Files with unchanged size and mtime are trusted without rehashing, so the common case stays cheap.
+    Files that were only touched (new mtime, same hash) get their new description put into the refreshed dict.
+    """
+    if set(recorded) != {os.path.basename(path) for path in paths}:
+        return False
+
+    for path in paths:
+        entry = recorded[os.path.basename(path)]
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            if file_digest(path) != entry["digest"]:
+                return False
+            if refreshed is not None:
+                refreshed[os.path.basename(path)] = dict(entry, mtime_ns=stat.st_mtime_ns)
+    return True
+
+
+def snapshot_sources_match(path, meta, paths):
+    """
+    sources_match for the snapshot at path. When a source was only touched, its new mtime is written back to
+    meta.json, so later loads trust it again without rehashing.
+    """
+    refreshed = {}
+    if not sources_match(meta["sources"], paths, refreshed):
+        return False
+    if refreshed:
+        meta["sources"].update(refreshed)
+        try:
+            update_meta(path, {"sources": meta["sources"]})
+        except OSError:  # read-only snapshot: rehash next time
+            pass
+    return True
+
+
+def pack_strings(strings):
+    """Encode a list of strings as (offsets, utf-8 blob); string i is blob[offsets[i]:offsets[i + 1]]"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def unpack_string(offsets, blob, i):
+    return bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+
+def unpack_strings(offsets, blob):
+    data = bytes(blob)
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def pack_ragged(lists, dtype=np.int32):
+    """Encode a list of integer lists as (offsets, values); list i is values[offsets[i]:offsets[i + 1]]"""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=offsets[1:])
+    values = np.fromiter((v for values in lists for v in values), dtype=dtype, count=int(offsets[-1]))
+    return offsets, values
+
+
+def write_snapshot(path, arrays, meta):
+    """
+    Write every array as its own .npy file next to a meta.json.
+    The snapshot is written to a temporary directory first and then moved in place,
+    so readers never see a half written snapshot. An existing directory at path is only replaced if it holds a
+    snapshot (a meta.json) or nothing, so a mistyped path never deletes other data.
+    """
+    if os.path.lexists(path) and not (os.path.isdir(path) and (os.path.isfile(os.path.join(path, META_FILE)) or not os.listdir(path))):
+        raise FileExistsError(f"{path} exists and is not a snapshot, refusing to replace it")
+    tmp_path = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+
+    meta = dict(meta, version=SNAPSHOT_VERSION, arrays=sorted(arrays))
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def add_arrays(path, arrays, meta):
+    """
+    Add arrays (replacing ones of the same name) and meta entries to the existing snapshot at path.
+    Every file is written under a temporary name and moved in place, meta.json last, so readers see either the old
+    or the new snapshot; arrays that are already memory-mapped stay valid.
+    """
+    for name, array in arrays.items():
+        tmp_file = os.path.join(path, f"{name}.npy.tmp-{os.getpid()}")
+        with open(tmp_file, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_file, os.path.join(path, f"{name}.npy"))
+    update_meta(path, meta, arrays=arrays)
+
+
+def update_meta(path, meta, arrays=()):
+    """Merge meta (and the names of newly added arrays) into the meta.json of the snapshot at path, replaced atomically"""
+    with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+        current = json.load(f)
+
+    current.update(meta, arrays=sorted(set(current["arrays"]) | set(arrays)))
+    tmp_meta = os.path.join(path, f"{META_FILE}.tmp-{os.getpid()}")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    os.replace(tmp_meta, os.path.join(path, META_FILE))
+
+
+def read_meta(path):
+    """Return the snapshot metadata, or None if there is no snapshot of the current version at path"""
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return None
+    return meta
+
+
+def read_arrays(path, meta, mmap=True):
+    """Load the snapshot arrays; with mmap=True they are memory-mapped read-only so processes share pages"""
+    arrays = {}
+    for name in meta["arrays"]:
+        file = os.path.join(path, f"{name}.npy")
+        try:
+            arrays[name] = np.load(file, mmap_mode="r" if mmap else None)
+        except ValueError:  # empty arrays cannot be memory-mapped
+            arrays[name] = np.load(file)
+    return arrays
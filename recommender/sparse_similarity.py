@@ -0,0 +1,90 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def build_incidence_matrix(offsets, values, n_ingredients):
+    """
+    Encode recipes x ingredients as a binary CSR incidence matrix from ragged ingredient ids,
+    where row r holds values[offsets[r]:offsets[r + 1]].
+    An ingredient listed twice in a recipe is counted once, exactly like the ingredient_to_recipes sets.
+    """
+    incidence = sp.csr_matrix(
+        (np.ones(len(values), dtype=np.int32), np.array(values, dtype=np.int32), np.array(offsets, dtype=np.int64)),
+        shape=(len(offsets) - 1, n_ingredients)
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    return incidence
+
+
+def append_rows(matrix, rows):
+    """CSR matrix with the rows of the CSR matrix rows added at the end; the column count grows to the wider of the two"""
+    return sp.csr_matrix(
+        (np.concatenate([matrix.data, rows.data]), np.concatenate([matrix.indices, rows.indices]),
+         np.concatenate([matrix.indptr, rows.indptr[1:] + matrix.indptr[-1]])),
+        shape=(matrix.shape[0] + rows.shape[0], max(matrix.shape[1], rows.shape[1]))
+    )
+
+
+def delete_row(matrix, row):
+    """CSR matrix without one row; only the entries of that row are cut out, the others are copied as they are"""
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    return sp.csr_matrix(
+        (np.concatenate([matrix.data[:start], matrix.data[end:]]), np.concatenate([matrix.indices[:start], matrix.indices[end:]]),
+         np.concatenate([matrix.indptr[:row + 1], matrix.indptr[row + 2:] - (end - start)])),
+        shape=(matrix.shape[0] - 1, matrix.shape[1])
+    )
+
+
+def shared_ingredient_edges(incidence, min_shared_ingredients=3, chunk_size=1024, max_entries=1 << 23):
+    """
+    Yield (rows, cols, weights) arrays of recipe pairs sharing at least min_shared_ingredients.
+    Shared counts are X[start:end] . X[start:]^T, so every pair is computed once (rows < cols) and
+    only one block of rows is ever materialized, which keeps memory bounded on the full dataset.
+    A block has at most chunk_size rows and at most about max_entries pairs sharing any ingredient (bounded by the
+    summed document frequencies of its rows' ingredients), so its size does not grow with the catalog.
+    """
+    incidence = sp.csr_matrix(incidence, dtype=np.int32)
+    n_recipes = incidence.shape[0]
+    document_frequency = np.bincount(incidence.indices, minlength=incidence.shape[1]).astype(np.int64)
+    work = np.concatenate([[0], np.cumsum(incidence @ document_frequency)])  # work[end] - work[start]: pairs of a block, at most
+
+    start = 0
+    while start < n_recipes:
+        end = np.searchsorted(work, work[start] + max_entries, side='right') - 1
+        end = int(min(max(end, start + 1), start + chunk_size, n_recipes))
+        shared = incidence[start:end] @ incidence[start:].T
+
+        # keep the pairs above the threshold, then the upper triangle (col > row); rows come from the CSR row pointers
+        positions = np.flatnonzero(shared.data >= min_shared_ingredients)
+        rows = np.searchsorted(shared.indptr, positions, side='right') - 1
+        cols = shared.indices[positions].astype(np.int64)
+        upper = cols > rows
+        yield rows[upper] + start, cols[upper] + start, shared.data[positions[upper]]
+        start = end
+
+
+def ingredient_idf(incidence):
+    """
+    Smoothed inverse document frequency of every ingredient column, log((1 + n) / (1 + df)) + 1.
+    Ubiquitous ingredients (salt, water, butter) get weights close to 1, rare ones up to log(n) + 1; always > 0.
+    """
+    n_recipes = incidence.shape[0]
+    document_frequency = np.bincount(incidence.indices, minlength=incidence.shape[1])
+    return np.log((1.0 + n_recipes) / (1.0 + document_frequency)) + 1.0
+
+
+def weighted_overlap(incidence, weighted_incidence, rows, cols, chunk_size=500_000):
+    """
+    For arrays of recipe row pairs, the sum of the weights of the ingredients recipe rows[i] shares with recipe cols[i]:
+    the (rows[i], cols[i]) entries of weighted_incidence . incidence^T, computed pair by pair with sparse row gathers
+    so the full product is never materialized.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    overlap = np.empty(len(rows), dtype=np.float64)
+    for start in range(0, len(rows), chunk_size):
+        end = start + chunk_size
+        pairs = weighted_incidence[rows[start:end]].multiply(incidence[cols[start:end]])
+        overlap[start:end] = np.asarray(pairs.sum(axis=1)).ravel()
+    return overlap
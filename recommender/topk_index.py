@@ -0,0 +1,109 @@
+import numpy as np
+
+
+def best_positions(neighbor_rows: np.ndarray, scores: np.ndarray, k: int):
+    """
+    Positions of the k best entries by decreasing score, ties by neighbor row, best first.
+    The k-th best score is found with a partial partition and only the entries reaching it (boundary ties included)
+    are sorted, instead of the whole row. NaN scores rank last.
+    """
+    if len(scores) > k > 0:
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(~(scores < kth))  # NaN compares False, so a NaN k-th score keeps everything
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((neighbor_rows[candidates], -scores[candidates]))][:k]
+
+
+class TopKIndex():
+    """
+    Precomputed top-K neighbors of every recipe row, one ranking per normalization type.
+    neighbors[norm] is an (n_recipes x depth) int32 array of neighbor rows padded with -1,
+    scores[norm] holds the matching similarity scores as float32.
+    """
+
+    def __init__(self, neighbors: dict[int, np.ndarray], scores: dict[int, np.ndarray], depth: int):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.depth = depth
+
+    @classmethod
+    def build(cls, adjacency, edge_scores: dict[int, np.ndarray], depth: int=50):
+        """
+        Build the index from a CSR adjacency matrix and, for every normalization type,
+        an array of scores aligned with adjacency.indices.
+        All rows are ranked at once: edges are sorted by (row, -score, neighbor row) and the first depth entries of
+        each row are kept, so ties do not depend on the order of the columns within a row.
+        """
+        n_rows = adjacency.shape[0]
+        indptr = np.asarray(adjacency.indptr)
+        indices = np.asarray(adjacency.indices)
+        degree = np.diff(indptr)
+        edge_rows = np.repeat(np.arange(n_rows), degree)
+
+        # slot j of row r is edge indptr[r] + j of the sorted order, if the row has that many neighbors;
+        # empty slots point one past the last edge, where a padding value is appended
+        slots = np.arange(depth)
+        valid = slots[None, :] < degree[:, None]
+        positions = np.where(valid, indptr[:-1, None] + slots[None, :], len(indices))
+
+        neighbors = {}
+        scores = {}
+        for norm, values in edge_scores.items():
+            order = np.lexsort((indices, -values, edge_rows))
+            neighbors[norm] = np.append(indices[order], -1)[positions].astype(np.int32)
+            scores[norm] = np.append(values[order], np.nan)[positions].astype(np.float32)
+
+        return cls(neighbors, scores, depth)
+
+    def to_arrays(self):
+        """Arrays for snapshot.write_snapshot, named topk_neighbors_<norm> and topk_scores_<norm>"""
+        arrays = {}
+        for norm in self.neighbors:
+            arrays[f'topk_neighbors_{norm}'] = self.neighbors[norm]
+            arrays[f'topk_scores_{norm}'] = self.scores[norm]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, normalization_types, depth: int):
+        """Wrap the arrays written by to_arrays (possibly memory-mapped read-only) without copying them"""
+        neighbors = {norm: arrays[f'topk_neighbors_{norm}'] for norm in normalization_types}
+        scores = {norm: arrays[f'topk_scores_{norm}'] for norm in normalization_types}
+        return cls(neighbors, scores, depth)
+
+    def covers(self, normalization_type: int, top_k: int):
+        return normalization_type in self.neighbors and top_k <= self.depth
+
+    def query(self, row: int, normalization_type: int, top_k: int):
+        """Return (neighbor rows, scores) of the top_k neighbors of row, best first"""
+        neighbors = self.neighbors[normalization_type][row, :top_k]
+        valid = neighbors >= 0
+        return neighbors[valid], self.scores[normalization_type][row, :top_k][valid]
+
+    def append_rows(self, n_rows: int):
+        """Add n_rows empty rows (for newly added recipes), fill them with set_row"""
+        for norm in self.neighbors:
+            self.neighbors[norm] = np.vstack([self.neighbors[norm], np.full((n_rows, self.depth), -1, dtype=np.int32)])
+            self.scores[norm] = np.vstack([self.scores[norm], np.full((n_rows, self.depth), np.nan, dtype=np.float32)])
+
+    def select_rows(self, keep):
+        """
+        Keep the rows where the boolean mask keep is set and renumber the neighbor rows accordingly.
+        Entries pointing to dropped rows are cleared; the rows holding them must be refreshed with set_row.
+        """
+        new_row = np.cumsum(keep) - 1
+        new_row = np.append(np.where(keep, new_row, -1), -1).astype(np.int32)  # new_row[-1] maps the -1 padding
+        for norm in self.neighbors:
+            self.neighbors[norm] = new_row[self.neighbors[norm][keep]]
+            self.scores[norm] = self.scores[norm][keep]
+
+    def set_row(self, row: int, normalization_type: int, neighbor_rows: np.ndarray, scores: np.ndarray):
+        """Replace the ranking of one row with the best `depth` of the given neighbors"""
+        order = best_positions(neighbor_rows, scores, self.depth)
+        if not self.neighbors[normalization_type].flags.writeable:  # memory-mapped from a snapshot
+            self.neighbors[normalization_type] = np.array(self.neighbors[normalization_type])
+            self.scores[normalization_type] = np.array(self.scores[normalization_type])
+        self.neighbors[normalization_type][row] = -1
+        self.scores[normalization_type][row] = np.nan
+        self.neighbors[normalization_type][row, :len(order)] = neighbor_rows[order]
+        self.scores[normalization_type][row, :len(order)] = scores[order]
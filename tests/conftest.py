@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import generate_dataset  # noqa: E402
+from recommender.graph_manager import GraphManager  # noqa: E402
+
+N_RECIPES = 300
+
+
+@pytest.fixture(scope="session")
+def data_path(tmp_path_factory):
+    """A small synthetic RAW_recipes.csv / RAW_interactions.csv pair, shared by all tests"""
+    path = str(tmp_path_factory.mktemp("data"))
+    generate_dataset(path, N_RECIPES, n_ingredients=400, seed=1)
+    return path + os.sep
+
+
+@pytest.fixture
+def manager(data_path):
+    """A freshly built GraphManager with a top-k index, safe to modify"""
+    return GraphManager(nrows=N_RECIPES, data_path=data_path, topk_depth=10)
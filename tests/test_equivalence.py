@@ -0,0 +1,129 @@
+"""
+The exactness claims of the optimized paths, checked against the simple implementations on a small synthetic dataset:
+sparse vs pairwise edge build, top-k index and batch scoring vs per-edge scores, pantry ranking vs brute force,
+snapshot round trip and staleness.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import N_RECIPES
+from recommender import snapshot
+from recommender.graph_manager import GraphManager
+
+
+def edge_set(manager):
+    rows, cols, weights = manager.adjacency.edges()
+    ids = manager.recipe_order
+    return {(frozenset((a, b)), float(w)) for a, b, w in zip(ids[rows].tolist(), ids[cols].tolist(), np.asarray(weights).tolist())}
+
+
+def brute_force_ranking(manager, recipe_id, normalization_type):
+    """(neighbor_id, score) of every neighbor through calculate_similarity_score, ranked like the index"""
+    rows = manager.adjacency.neighbors(manager.recipe_row[recipe_id])[0]
+    scored = [(manager.calculate_similarity_score(normalization_type, int(manager.recipe_order[row]), recipe_id), int(row)) for row in rows]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(int(manager.recipe_order[row]), score) for score, row in scored]
+
+
+def assert_same_ranking(actual, expected):
+    assert [rid for rid, _ in actual] == [rid for rid, _ in expected]
+    np.testing.assert_allclose([score for _, score in actual], [score for _, score in expected], rtol=1e-5)
+
+
+@pytest.fixture(scope="module")
+def built(data_path):
+    return GraphManager(nrows=N_RECIPES, data_path=data_path)
+
+
+@pytest.fixture(scope="module")
+def indexed(data_path):
+    return GraphManager(nrows=N_RECIPES, data_path=data_path, topk_depth=20)
+
+
+def test_fresh_build_is_consistent(indexed):
+    assert indexed.check_consistency() == []
+
+
+@pytest.mark.parametrize("options", [{'build_method': 'combinations'}, {'graph_backend': 'networkx'}])
+def test_edge_builds_agree(data_path, built, options):
+    other = GraphManager(nrows=N_RECIPES, data_path=data_path, **options)
+    assert np.array_equal(other.recipe_order, built.recipe_order)
+    assert edge_set(other) == edge_set(built)
+
+
+def test_minhash_edges_are_exact_edges(data_path, built):
+    approximate = GraphManager(nrows=N_RECIPES, data_path=data_path, build_method='minhash')
+    found = edge_set(approximate)
+    assert found and found <= edge_set(built)
+
+
+@pytest.mark.parametrize("normalization_type", GraphManager.NORMALIZATION_TYPES)
+def test_scoring_paths_agree(built, indexed, normalization_type):
+    recipe_ids = built.recipe_order[:25].tolist()
+    batch = built.recommend_batch(recipe_ids, 10, normalization_type)
+    indexed_batch = indexed.recommend_batch(recipe_ids, 10, normalization_type)
+    for recipe_id, from_batch, from_indexed_batch in zip(recipe_ids, batch, indexed_batch):
+        expected = brute_force_ranking(built, recipe_id, normalization_type)[:10]
+        assert_same_ranking(built.score_neighbors(recipe_id, 10, normalization_type), expected)
+        assert_same_ranking(indexed.score_neighbors(recipe_id, 10, normalization_type), expected)
+        assert_same_ranking(from_batch, expected)
+        assert_same_ranking(from_indexed_batch, expected)
+
+
+@pytest.mark.parametrize("max_missing", [None, 2])
+def test_pantry_matches_brute_force(built, max_missing):
+    pantry = set(built.get_recipe_ingredients(built.recipe_order[0])[:4]) | set(built.get_recipe_ingredients(built.recipe_order[1])[:3])
+    candidates = []
+    for row, recipe_id in enumerate(built.recipe_order.tolist()):
+        ingredients = set(built.get_recipe_ingredients(recipe_id))
+        covered, missing = len(ingredients & pantry), len(ingredients - pantry)
+        if covered and (max_missing is None or missing <= max_missing):
+            rating = np.nan_to_num(built.store.smoothed_rating[row])
+            candidates.append(((missing, -covered / len(ingredients), -rating, row), recipe_id))
+    expected = [recipe_id for _, recipe_id in sorted(candidates)[:10]]
+    assert [record['id'] for record in built.recipes_from_pantry(pantry, max_missing=max_missing, top_k=10)] == expected
+
+
+def test_snapshot_round_trip(indexed, tmp_path):
+    path = str(tmp_path / "snapshot")
+    indexed.save(path)
+    loaded = GraphManager.load(path)
+    assert loaded.topk_index is not None
+    assert edge_set(loaded) == edge_set(indexed)
+    assert loaded.check_consistency() == []
+    for normalization_type in GraphManager.NORMALIZATION_TYPES:
+        recipe_ids = indexed.recipe_order[:10].tolist()
+        assert loaded.recommend_batch(recipe_ids, 10, normalization_type) == indexed.recommend_batch(recipe_ids, 10, normalization_type)
+
+
+def test_snapshot_is_rebuilt_when_stale(data_path, tmp_path):
+    data = str(tmp_path / "data") + os.sep
+    shutil.copytree(data_path, data, ignore=shutil.ignore_patterns("cache"))
+    path = str(tmp_path / "snapshot")
+
+    GraphManager.load_or_build(path, nrows=N_RECIPES, data_path=data)
+    first = snapshot.read_meta(path)
+    GraphManager.load_or_build(path, nrows=N_RECIPES, data_path=data)
+    assert snapshot.read_meta(path)['sources'] == first['sources']  # fresh: loaded, not rewritten
+
+    GraphManager.load_or_build(path, nrows=N_RECIPES, data_path=data, min_shared_ingredients=4)
+    assert snapshot.read_meta(path)['params']['min_shared_ingredients'] == 4
+
+    stale = GraphManager.load(path)
+    recipe_id = int(stale.recipe_order[0])
+    count = stale.store.rating_count[stale.recipe_row[recipe_id]]
+    with open(os.path.join(data, "RAW_interactions.csv"), "a", encoding="utf-8") as f:
+        f.write(f"1,{recipe_id},2020-01-01,5,new rating\n")
+    GraphManager.load_or_build(path, nrows=N_RECIPES, data_path=data, min_shared_ingredients=4)
+    assert snapshot.read_meta(path)['sources'] != first['sources']
+    rebuilt = GraphManager.load(path)
+    assert rebuilt.store.rating_count[rebuilt.recipe_row[recipe_id]] == count + 1
+
+
+def test_save_refuses_to_replace_other_directories(built, data_path):
+    with pytest.raises(FileExistsError):
+        built.save(data_path)
+    assert os.path.exists(os.path.join(data_path, "RAW_recipes.csv"))
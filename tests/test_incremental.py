@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_add_remove_and_rate_match_a_rebuild(manager):
+    base = manager.recipe_order[0]
+    records = pd.DataFrame([
+        {'id': 990000001, 'name': 'no description', 'ingredients': str(manager.get_recipe_ingredients(base) + ['brand new']),
+         'minutes': np.nan, 'steps': np.nan, 'description': np.nan},
+        {'id': 990000002, 'name': 'no minutes', 'ingredients': manager.get_recipe_ingredients(manager.recipe_order[1]),
+         'minutes': None, 'steps': "['mix', 'bake']", 'description': "quick"},
+        {'id': 990000003, 'name': np.nan, 'ingredients': "['salt']", 'minutes': 5, 'steps': "[]", 'description': ""},
+    ]).to_dict('records')
+
+    assert manager.add_recipes(records) == [990000001, 990000002]  # the nameless recipe is skipped like in load_data
+    assert manager.get_description(990000001) == "No description available."
+    assert manager.get_minutes(990000002) == 0
+    assert manager.check_consistency() == []
+
+    manager.remove_recipe(int(manager.recipe_order[5]))
+    manager.remove_recipe(990000002)
+    assert manager.check_consistency() == []
+
+    rated = manager.recipe_order[:3].tolist()
+    manager.apply_ratings(pd.DataFrame({'recipe_id': rated + [990000001], 'rating': [5, 1, 4, 3]}))
+    assert manager.check_consistency() == []
+
+
+@pytest.mark.parametrize("record", [
+    {'id': 990000010, 'name': 'missing ingredients'},
+    {'id': 'abc', 'name': 'bad id', 'ingredients': ['salt']},
+    {'id': 990000010, 'name': 'bad minutes', 'ingredients': ['salt'], 'minutes': 'ten'},
+    {'id': 990000010, 'name': 'bad description', 'ingredients': ['salt'], 'description': 3},
+    {'id': 990000011, 'name': 'duplicate id', 'ingredients': ['salt']},
+])
+def test_invalid_record_changes_nothing(manager, record):
+    n_recipes, n_ingredients = len(manager.store), len(manager.store.vocabulary)
+    valid = {'id': 990000011, 'name': 'valid', 'ingredients': ['an ingredient nobody has', 'salt']}
+    with pytest.raises(ValueError):
+        manager.add_recipes([valid, record])
+    assert (len(manager.store), len(manager.store.vocabulary)) == (n_recipes, n_ingredients)
+    assert 990000011 not in manager.recipe_row
+    assert manager.check_consistency() == []
+
+
+@pytest.mark.parametrize("rating", [4.5, float('nan')])
+def test_fractional_rating_is_rejected(manager, rating):
+    recipe_id = int(manager.recipe_order[0])
+    before = (manager.store.rating_sum.copy(), manager.store.rating_count.copy())
+    with pytest.raises(ValueError):
+        manager.apply_ratings([(recipe_id, 5), (recipe_id, rating)])
+    assert np.array_equal(manager.store.rating_sum, before[0]) and np.array_equal(manager.store.rating_count, before[1])
+    manager.apply_ratings([(recipe_id, 4.0)])
+    assert manager.check_consistency() == []